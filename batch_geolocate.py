@@ -0,0 +1,210 @@
+'''
+batch_geolocate.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module geolocates every detection of a recorded flight on all cores, sharding the work per frame.
+Version: v1.0.0
+'''
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+# per worker process state, set by _init_worker
+_worker = {}
+
+
+def _init_worker(images, names, count):
+    _worker["images"] = images
+    _worker["memory"] = [shared_memory.SharedMemory(name=name) for name in names]
+    _worker["arrays"] = [np.ndarray(count, dtype=np.float64, buffer=memory.buf) for memory in _worker["memory"]]
+
+
+def _project(images, arrays, tasks, inverse):
+    '''
+    Project the points of each task in place.
+    Input:  images - list of GeoImage objects
+            arrays - input a, input b, output a, output b arrays, sorted by frame
+            tasks - list of (frame position, start, stop) slices of the arrays
+            inverse - True for geo-to-pixel, False for pixel-to-geo
+    '''
+    a, b, out_a, out_b = arrays
+    for frame, start, stop in tasks:
+        image = images[frame]
+        if inverse:
+            out_a[start:stop], out_b[start:stop] = image.get_pixels_batch(a[start:stop], b[start:stop])
+        else:
+            out_a[start:stop], out_b[start:stop], _ = image.get_coordinates_batch(a[start:stop], b[start:stop])
+
+
+def _run_tasks(tasks, inverse):
+    _project(_worker["images"], _worker["arrays"], tasks, inverse)
+    return len(tasks)
+
+
+def _shard(frames, workers):
+    '''
+    Input:  frames - sorted array of frame positions, one per point
+            workers - number of worker processes
+    Output: list of tasks, each a list of (frame position, start, stop) slices of contiguous points
+    '''
+    boundaries = np.flatnonzero(np.diff(frames)) + 1
+    starts = np.concatenate([[0], boundaries])
+    stops = np.concatenate([boundaries, [frames.size]])
+    slices = [(int(frames[start]), int(start), int(stop)) for start, stop in zip(starts, stops)]
+
+    # group whole frames into about four tasks per worker, balanced by point count
+    target = max(1, frames.size // (workers * 4))
+    tasks, current, size = [], [], 0
+    for frame_slice in slices:
+        current.append(frame_slice)
+        size += frame_slice[2] - frame_slice[1]
+        if size >= target:
+            tasks.append(current)
+            current, size = [], 0
+    if current:
+        tasks.append(current)
+    return tasks
+
+
+def _batch(images, frames, a, b, inverse, workers):
+    frames = np.asarray(frames, dtype=np.int64).ravel()
+    a = np.asarray(a, dtype=np.float64).ravel()
+    b = np.asarray(b, dtype=np.float64).ravel()
+    count = frames.size
+    if not (a.size == b.size == count):
+        raise ValueError("frames, and both coordinate arrays must have the same length")
+    if count == 0:
+        return np.empty(0), np.empty(0)
+    workers = workers or os.cpu_count() or 1
+
+    # sort the points by frame so that every frame is one contiguous slice
+    order = np.argsort(frames, kind="stable")
+    frames = frames[order]
+    tasks = _shard(frames, workers)
+
+    if workers == 1:
+        arrays = [a[order], b[order], np.empty(count), np.empty(count)]
+        _project(images, arrays, [task for group in tasks for task in group], inverse)
+        out_a, out_b = arrays[2], arrays[3]
+    else:
+        memory = [shared_memory.SharedMemory(create=True, size=count * 8) for _ in range(4)]
+        try:
+            arrays = [np.ndarray(count, dtype=np.float64, buffer=block.buf) for block in memory]
+            arrays[0][:] = a[order]
+            arrays[1][:] = b[order]
+            geometry = [image.without_pixels() for image in images]
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(geometry, [block.name for block in memory], count)) as pool:
+                list(pool.map(_run_tasks, tasks, [inverse] * len(tasks)))
+            out_a, out_b = arrays[2].copy(), arrays[3].copy()
+            del arrays
+        finally:
+            for block in memory:
+                block.close()
+                block.unlink()
+
+    # restore the input order
+    result_a = np.empty(count)
+    result_b = np.empty(count)
+    result_a[order] = out_a
+    result_b[order] = out_b
+    return result_a, result_b
+
+
+def geolocate_flight(images, frames, x, y, workers=None):
+    '''
+    Convert the detections of a whole flight to geographical coordinates on all cores.
+    Input:  images - list of GeoImage objects
+            frames - array of positions in images, one per detection
+            x, y - arrays of pixel coordinates, one per detection
+            workers - number of worker processes, defaults to the number of cores; 1 runs in process
+    Output: lat, lon, alt - arrays in the order of the input detections
+
+    Pixel and result arrays are shared with the workers through shared memory, only the
+    frame geometry and the task slices are pickled.
+
+    >>> from geo_core import Coordinate
+    >>> from geo_image import GeoImage
+    >>> from geo_image_set import GeoImageSet
+    >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+    >>> images = GeoImageSet.from_images([GeoImage(None, coordinate.offset_coordinate(5 * i, 90), 1, -2, 10 * i,
+    ...                                            4056, 3040, 6.29, 4.71, 78.3, index=i) for i in range(4)])
+    >>> frames, x, y = np.array([0, 3, 1, 3]), np.array([10.0, 2028, 4000, 50]), np.array([20.0, 1520, 3000, 60])
+    >>> lat, lon, alt = geolocate_flight(list(images), frames, x, y, workers=2)
+    >>> expected, _, _ = images.get_coordinates(frames, x, y)
+    >>> bool(np.array_equal(lat, expected)), alt.tolist()
+    (True, [20.0, 20.0, 20.0, 20.0])
+
+    Pixels that see the sky have NaN altitude, as in GeoImage.get_coordinates_batch.
+
+    >>> tilted = [GeoImage(None, coordinate, 0, 80, 0, 4056, 3040, 6.29, 4.71, 78.3)]
+    >>> lat, lon, alt = geolocate_flight(tilted, [0, 0], [2028, 2028], [0, 3040], workers=1)
+    >>> np.isnan(lat).tolist(), np.isnan(alt).tolist()
+    ([True, False], [True, False])
+    '''
+    lat, lon = _batch(images, frames, x, y, False, workers)
+    altitudes = np.array([image.coordinate.alt for image in images], dtype=np.float64)
+    return lat, lon, np.where(np.isnan(lat), np.nan, altitudes[np.asarray(frames, dtype=np.int64).ravel()])
+
+
+def project_flight(images, frames, lat, lon, workers=None):
+    '''
+    Convert geographical coordinates to pixel coordinates in their frames on all cores.
+    Input:  images - list of GeoImage objects
+            frames - array of positions in images, one per coordinate
+            lat, lon - arrays of coordinates in degrees
+            workers - number of worker processes, defaults to the number of cores; 1 runs in process
+    Output: x, y - integer arrays of pixel coordinates in the order of the input coordinates
+
+    >>> from geo_core import Coordinate
+    >>> from geo_image import GeoImage
+    >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+    >>> images = [GeoImage(None, coordinate.offset_coordinate(5 * i, 90), 0, 0, 15 * i,
+    ...                    4056, 3040, 6.29, 4.71, 78.3, index=i) for i in range(3)]
+    >>> lat, lon, _ = images[2].get_coordinates_batch([100.5, 3000.5], [200.5, 2500.5])
+    >>> x, y = project_flight(images, [2, 2], lat, lon, workers=2)
+    >>> x.tolist(), y.tolist()
+    ([100, 3000], [200, 2500])
+    '''
+    x, y = _batch(images, frames, lat, lon, True, workers)
+    return x.astype(np.int64), y.astype(np.int64)
+
+
+def scaling_report(images, frames, x, y, worker_counts=None, repeat=1):
+    '''
+    Measure how geolocate_flight scales across cores.
+    Input:  images, frames, x, y - as for geolocate_flight
+            worker_counts - worker counts to measure, defaults to powers of two up to the number of cores
+            repeat - number of timed runs per worker count, the fastest is kept
+    Output: list of dicts with the workers, seconds, points per second, speedup and efficiency,
+            relative to the first worker count
+
+    >>> from geo_core import Coordinate
+    >>> from geo_image import GeoImage
+    >>> images = [GeoImage(None, Coordinate(38.3155, -76.5509, 20, use_int=False), 0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3)]
+    >>> report = scaling_report(images, np.zeros(1000, dtype=np.int64), np.full(1000, 2028.0), np.full(1000, 1520.0), [1, 2])
+    >>> [row["workers"] for row in report], report[0]["speedup"], report[0]["efficiency"], sorted(report[1])
+    ([1, 2], 1.0, 1.0, ['efficiency', 'points_per_second', 'seconds', 'speedup', 'workers'])
+    '''
+    if worker_counts is None:
+        cores = os.cpu_count() or 1
+        worker_counts = sorted({2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores} | {cores})
+
+    report = []
+    for workers in worker_counts:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            geolocate_flight(images, frames, x, y, workers)
+            best = min(best, time.perf_counter() - start)
+        report.append({"workers": workers, "seconds": best, "points_per_second": np.size(x) / best})
+
+    baseline = report[0]["seconds"] * report[0]["workers"]
+    for row in report:
+        row["speedup"] = report[0]["seconds"] / row["seconds"]
+        row["efficiency"] = baseline / (row["seconds"] * row["workers"])
+    return report
@@ -0,0 +1,295 @@
+'''
+benchmark.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module benchmarks projection, containment and target mapping throughput on synthetic frames, without image files or displays.
+Version: v1.0.0
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+from geo_core import Coordinate
+from geo_image import GeoImage, containment_matrix
+from batch_geolocate import scaling_report
+from footprint_index import FootprintIndex
+from ingest import simulate
+from query_cache import QueryCache
+from targetMapper import Craft
+
+THRESHOLDS_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "benchmark_thresholds.json")
+
+RES_X = 4056
+RES_Y = 3040
+SENSOR_WIDTH = 6.29 # mm
+SENSOR_HEIGHT = 4.71 # mm
+FOV = 78.3 # degrees
+ORIGIN = (38.3155, -76.5509) # survey area used for the synthetic frames
+
+# import statements timed in a fresh interpreter, geo_image used to load cv2 on import
+IMPORTS = {
+    "interpreter": "",
+    "geo_core": "import geo_core",
+    "geo_image": "import geo_image",
+    "geo_image_and_cv2": "import geo_image, cv2",
+}
+
+IMPORT_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+seconds = time.perf_counter() - start
+try:
+    # peak of this process only, ru_maxrss can carry over the peak of the parent
+    with open("/proc/self/status") as status:
+        rss = int(status.read().split("VmHWM:")[1].split()[0]) * 1024
+except (OSError, IndexError):
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = rss if sys.platform == "darwin" else rss * 1024 # bytes on macOS, kilobytes elsewhere
+    except ImportError:
+        rss = None
+print(json.dumps({"seconds": seconds, "max_rss_bytes": rss}))
+'''
+
+
+def synthetic_frames(count, seed=0):
+    '''
+    Input:  count - number of frames
+            seed - random seed
+    Output: list of geometry-only GeoImage objects along a straight leg with noisy attitude
+    '''
+    rng = np.random.default_rng(seed)
+    origin = Coordinate(ORIGIN[0], ORIGIN[1], 0, use_int=False)
+    frames = []
+    for i in range(count):
+        coordinate = origin.offset_coordinate(5 * i, 90)
+        coordinate.alt = 20 + rng.normal(0, 0.5)
+        frames.append(GeoImage(
+            image=None,
+            coordinate=coordinate,
+            roll=rng.normal(0, 1),
+            pitch=rng.normal(0, 1),
+            heading=90 + rng.normal(0, 3),
+            res_x=RES_X,
+            res_y=RES_Y,
+            sensor_width=SENSOR_WIDTH,
+            sensor_height=SENSOR_HEIGHT,
+            fov=FOV,
+            index=i
+        ))
+    return frames
+
+
+def synthetic_pixels(count, seed=0):
+    '''
+    Input:  count - number of pixels
+            seed - random seed
+    Output: x, y - arrays of pixel coordinates uniformly spread over the frame
+    '''
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, RES_X, count), rng.uniform(0, RES_Y, count)
+
+
+def measure(func, points, repeat):
+    '''
+    Input:  func - callable to time
+            points - number of points processed by one call
+            repeat - number of timed calls, the fastest is kept
+    Output: dict with the points, best time in seconds and points per second
+    '''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return {"points": points, "seconds": best, "points_per_second": points / best}
+
+
+def run(points=10000, images=500, targets=2000, repeat=3):
+    '''
+    Input:  points - number of pixels for the projection benchmarks
+            images - number of frames for the containment benchmarks
+            targets - number of targets for the containment benchmarks
+            repeat - number of timed calls per benchmark
+    Output: dict of benchmark results keyed by name
+    '''
+    frame = synthetic_frames(1)[0]
+    x, y = synthetic_pixels(points)
+    lat, lon, _ = frame.get_coordinates_batch(x, y)
+    coordinates = [Coordinate(a, b, 0, use_int=False) for a, b in zip(lat, lon)]
+    scalar_points = min(points, 1000) # the scalar paths are timed on a subset
+
+    frames = synthetic_frames(images)
+    rng = np.random.default_rng(1)
+    target_lat = ORIGIN[0] + rng.uniform(-0.0002, 0.0002, targets)
+    target_lon = ORIGIN[1] + rng.uniform(0, 5 * images / 87000, targets)
+    target_coordinates = [Coordinate(a, b, 0, use_int=False) for a, b in zip(target_lat[:20], target_lon[:20])]
+
+    index = FootprintIndex()
+    for geo_image in frames:
+        index.insert(geo_image)
+
+    craft = Craft(ORIGIN[0], ORIGIN[1], 20, 0.01, 0.01, 90)
+    craft_x = x * (craft.geosensor.RESOLUTION_X / RES_X)
+    craft_y = y * (craft.geosensor.RESOLUTION_Y / RES_Y)
+
+    results = {}
+    results["forward_scalar"] = measure(
+        lambda: [frame.get_coordinates(x[i], y[i]) for i in range(scalar_points)], scalar_points, repeat)
+    results["forward_batch"] = measure(lambda: frame.get_coordinates_batch(x, y), points, repeat)
+    results["inverse_scalar"] = measure(
+        lambda: [frame.get_pixels(coordinates[i]) for i in range(scalar_points)], scalar_points, repeat)
+    # repeated queries of the same pixels and coordinates, answered from the query cache after the first pass
+    cached = synthetic_frames(1)[0]
+    cached.query_cache = QueryCache(max_entries=2 * scalar_points)
+    results["forward_scalar_cached"] = measure(
+        lambda: [cached.get_coordinates(x[i], y[i]) for i in range(scalar_points)], scalar_points, repeat)
+    results["inverse_scalar_cached"] = measure(
+        lambda: [cached.get_pixels(coordinates[i]) for i in range(scalar_points)], scalar_points, repeat)
+    results["inverse_batch"] = measure(lambda: frame.get_pixels_batch(lat, lon), points, repeat)
+    results["containment_scalar"] = measure(
+        lambda: [[target in geo_image for target in target_coordinates] for geo_image in frames],
+        images * len(target_coordinates), repeat)
+    results["containment_matrix"] = measure(
+        lambda: containment_matrix(frames, target_lat, target_lon), images * targets, repeat)
+    results["containment_index"] = measure(lambda: index.query_batch(target_lat, target_lon), targets, repeat)
+    results["craft_get_target"] = measure(
+        lambda: [craft.getTarget(craft_x[i], craft_y[i]) for i in range(scalar_points)], scalar_points, repeat)
+    results["craft_get_target_array"] = measure(lambda: craft.getTargetArray(craft_x, craft_y), points, repeat)
+
+    return results
+
+
+def measure_imports(repeat):
+    '''
+    Input:  repeat - fresh interpreters started per import statement
+    Output: dict of name -> best import time in seconds and peak resident memory in bytes
+    '''
+    directory = os.path.abspath(os.path.dirname(__file__))
+    results = {}
+    for name, statement in IMPORTS.items():
+        runs = []
+        for _ in range(repeat):
+            completed = subprocess.run([sys.executable, "-c", IMPORT_PROBE, statement], cwd=directory,
+                                       capture_output=True, text=True)
+            if completed.returncode != 0:
+                break
+            runs.append(json.loads(completed.stdout))
+        if not runs:
+            results[name] = {"error": completed.stderr.strip().splitlines()[-1]}
+            continue
+        results[name] = {
+            "seconds": min(run["seconds"] for run in runs),
+            "max_rss_bytes": min(run["max_rss_bytes"] for run in runs) if runs[0]["max_rss_bytes"] else None,
+        }
+    return results
+
+
+def measure_ingest(duration):
+    '''
+    Input:  duration - seconds to run the simulated ingest service for
+    Output: dict with the number of frames geolocated and their mean and maximum latency in seconds
+    '''
+    targets, _ = asyncio.run(simulate(duration=duration))
+    latency = np.array([target.latency for target in targets])
+    return {
+        "frames": len(targets),
+        "mean_latency_seconds": float(latency.mean()) if latency.size else None,
+        "max_latency_seconds": float(latency.max()) if latency.size else None,
+    }
+
+
+def measure_scaling(points, images, repeat):
+    '''
+    Input:  points - detections geolocated per run, spread over the frames
+            images - number of frames
+            repeat - timed runs per worker count
+    Output: rows of batch_geolocate.scaling_report
+    '''
+    frames = synthetic_frames(images)
+    rng = np.random.default_rng(2)
+    x, y = synthetic_pixels(points)
+    return scaling_report(frames, rng.integers(0, images, points), x, y, repeat=repeat)
+
+
+def check_thresholds(results, thresholds):
+    '''
+    Input:  results - benchmark results from run
+            thresholds - dict of minimum points per second keyed by benchmark name
+    Output: list of regression messages, empty if every benchmark meets its threshold
+    '''
+    regressions = []
+    for name, minimum in thresholds.items():
+        if name in results and results[name]["points_per_second"] < minimum:
+            regressions.append(f"{name}: {results[name]['points_per_second']:.0f} points/s < {minimum} points/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GPSLocator projection, containment and target mapping throughput.")
+    parser.add_argument("--output", default="benchmark_results.json", help="path of the JSON results file")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH, help="path of the JSON regression thresholds")
+    parser.add_argument("--points", type=int, default=10000, help="pixels per projection benchmark")
+    parser.add_argument("--images", type=int, default=500, help="frames per containment benchmark")
+    parser.add_argument("--targets", type=int, default=2000, help="targets per containment benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="timed calls per benchmark")
+    parser.add_argument("--import-repeat", type=int, default=3, help="fresh interpreters per import benchmark, 0 to skip")
+    parser.add_argument("--ingest-duration", type=float, default=1.0, help="seconds of simulated ingest, 0 to skip")
+    parser.add_argument("--scaling-points", type=int, default=0, help="detections per multi-core scaling run, 0 to skip")
+    args = parser.parse_args()
+
+    results = run(args.points, args.images, args.targets, args.repeat)
+    imports = measure_imports(args.import_repeat) if args.import_repeat > 0 else {}
+    ingest = measure_ingest(args.ingest_duration) if args.ingest_duration > 0 else {}
+    scaling = measure_scaling(args.scaling_points, args.images, args.repeat) if args.scaling_points > 0 else []
+
+    thresholds = {}
+    if args.thresholds and os.path.exists(args.thresholds):
+        with open(args.thresholds) as file:
+            thresholds = json.load(file)
+    regressions = check_thresholds(results, thresholds)
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "results": results,
+            "imports": imports,
+            "ingest": ingest,
+            "scaling": scaling,
+            "regressions": regressions,
+        }, file, indent=2)
+
+    for name, result in results.items():
+        print(f"{name:<24} {result['points_per_second']:>14,.0f} points/s")
+    for name, result in imports.items():
+        if "error" in result:
+            print(f"import {name:<17} failed: {result['error']}")
+        else:
+            rss = f"{result['max_rss_bytes'] / 2 ** 20:>8.1f} MiB" if result["max_rss_bytes"] else ""
+            print(f"import {name:<17} {result['seconds'] * 1000:>9.1f} ms {rss}")
+    if ingest.get("frames"):
+        print(f"ingest {ingest['frames']:>6} frames    latency mean {ingest['mean_latency_seconds'] * 1000:.1f} ms "
+              f"max {ingest['max_latency_seconds'] * 1000:.1f} ms")
+    for row in scaling:
+        print(f"scaling {row['workers']:>3} workers {row['seconds']:>8.3f} s {row['points_per_second']:>14,.0f} points/s "
+              f"speedup {row['speedup']:.2f} efficiency {row['efficiency']:.2f}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+'''
+chips.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module extracts image chips around ground coordinates from every frame that saw them.
+Version: v1.0.0
+'''
+
+import numpy as np
+from geo_image import containment_matrix
+from geo_image_set import GeoImageSet
+
+
+def extract_chips(images, lat, lon, size=64, index=None):
+    '''
+    Cut a square chip around each coordinate from every frame that contains it.
+    Input:  images - GeoImageSet, or sequence of GeoImage objects
+            lat, lon - array-likes of coordinates in degrees
+            size - width and height of the chips in pixels of the decoded images
+            index - optional FootprintIndex over the same images, used instead of checking every frame
+    Output: chips - array of shape (n, size, size, channels), zero padded where a chip runs off its frame
+            frames - array of the index attribute of the frame each chip was cut from
+            targets - array of the position in lat, lon of the coordinate each chip is centered on
+
+    Frames are found and projected in batches, then each frame is decoded once through the image
+    cache and all of its chips are sliced from that single decode. Chips are ordered by frame.
+
+    >>> from geo_core import Coordinate
+    >>> from geo_image import GeoImage
+    >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+    >>> pixels = np.arange(304 * 406 * 3, dtype=np.uint32).reshape(304, 406, 3).astype(np.uint8)
+    >>> images = [GeoImage(pixels.copy(), coordinate.offset_coordinate(10 * i, 90),
+    ...                    0, 0, 0, 406, 304, 6.29, 4.71, 78.3, index=i) for i in range(3)]
+    >>> targets = [coordinate, coordinate.offset_coordinate(15, 90)]
+    >>> chips, frames, positions = extract_chips(images, [t.lat for t in targets], [t.lon for t in targets], size=8)
+    >>> chips.shape, frames.tolist(), positions.tolist()
+    ((4, 8, 8, 3), [0, 1, 1, 2], [0, 0, 1, 1])
+    >>> bool(np.array_equal(chips[0], pixels[148:156, 199:207]))
+    True
+
+    A GeoImageSet reads the pixels through the sources of its frames.
+
+    >>> lazy = [GeoImage(lambda: pixels, image.coordinate, 0, 0, 0, 406, 304, 6.29, 4.71, 78.3, index=image.index)
+    ...         for image in images]
+    >>> chips, frames, positions = extract_chips(GeoImageSet.from_images(lazy), [coordinate.lat], [coordinate.lon], size=8)
+    >>> frames.tolist(), bool(np.array_equal(chips[0], pixels[148:156, 199:207]))
+    ([0, 1], True)
+    '''
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    lon = np.asarray(lon, dtype=np.float64).ravel()
+
+    # find the frames that contain each coordinate
+    if index is not None:
+        found = index.query_batch(lat, lon)
+        frame_rows = np.array([p for positions in found for p in positions], dtype=np.int64)
+        targets = np.repeat(np.arange(lat.size), [len(positions) for positions in found])
+        order = np.lexsort((targets, frame_rows))
+        frame_rows, targets = frame_rows[order], targets[order]
+        images = index.images
+    elif isinstance(images, GeoImageSet):
+        frame_rows, targets = np.nonzero(images.contains(lat, lon))
+    else:
+        frame_rows, targets = np.nonzero(containment_matrix(images, lat, lon))
+
+    # project the coordinates into the frames that contain them
+    if isinstance(images, GeoImageSet):
+        x, y = images.get_pixels(frame_rows, lat[targets], lon[targets])
+    else:
+        x = np.empty(frame_rows.size, dtype=np.int64)
+        y = np.empty(frame_rows.size, dtype=np.int64)
+        for row in np.unique(frame_rows):
+            pairs = frame_rows == row
+            x[pairs], y[pairs] = images[row].get_pixels_batch(lat[targets[pairs]], lon[targets[pairs]])
+
+    chips = []
+    frames = np.empty(frame_rows.size, dtype=np.int64)
+    for row in np.unique(frame_rows):
+        frame = images[row]
+        pixels = frame.image
+        if pixels is None:
+            raise ValueError(f"Image {frame.index} has no pixels to cut chips from")
+        pairs = np.flatnonzero(frame_rows == row)
+        # the decoded image may be scaled down from the sensor resolution
+        scale_x, scale_y = pixels.shape[1] / frame.res_x, pixels.shape[0] / frame.res_y
+        for pair in pairs:
+            chips.append(_slice_padded(pixels, int(x[pair] * scale_x), int(y[pair] * scale_y), size))
+        frames[pairs] = frame.index
+
+    if not chips:
+        return np.zeros((0, size, size, 3), dtype=np.uint8), frames, targets
+    return np.stack(chips), frames, targets
+
+
+def _slice_padded(pixels, x, y, size):
+    '''
+    Input:  pixels - decoded image
+            x, y - pixel at the center of the chip
+            size - width and height of the chip
+    Output: chip of shape (size, size, channels), zero padded where it runs off the image
+    '''
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    chip = np.zeros((size, size, pixels.shape[2]), dtype=pixels.dtype)
+    left, top = x - size // 2, y - size // 2
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(left + size, pixels.shape[1]), min(top + size, pixels.shape[0])
+    if x0 < x1 and y0 < y1:
+        chip[y0 - top:y1 - top, x0 - left:x1 - left] = pixels[y0:y1, x0:x1]
+    return chip
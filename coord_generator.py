@@ -1,13 +1,26 @@
 import os
-import sys
-sys.path.append("../")
-from MAVez.Coordinate import Coordinate
-from GPSLocator.geo_image import GeoImage
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from geo_core import Coordinate, _geo_to_pixels, _offset_coordinates, rotation_matrix
+from geo_image import GeoImage
+from geo_image_set import GeoImageSet
+from telemetry import TelemetryBuffer
 import numpy as np
 import math
-import cv2
 
-def generate_geo_images():
+FOCAL_LENGTH = 3.83 # mm
+SENSOR_WIDTH = 6.29 # mm
+SENSOR_HEIGHT = 4.71 # mm
+RES_X = 4056
+RES_Y = 3040
+FOV = 78.3 # degrees
+
+def _frame_telemetry():
+    '''
+    Output: generator of (index, coordinate, attitude) for each frame of the test flight
+
+    Interpolates the keypoint attitudes along the leg between the start and end coordinates.
+    '''
 
     end_coord = Coordinate(38.31583202378429, -76.5527183058615, 0, use_int=False)
     start_coord = Coordinate(38.31552770581607, -76.5509148682147, 0, use_int=False)
@@ -25,69 +38,325 @@ def generate_geo_images():
         20: {'alt': 20, 'yaw': 0, 'pitch': 0, 'roll': 0},
     }
 
-    attitude_list = []
+    step = distance / count
 
-    current_kp = 0
-    next_kp = 5
+    # interpolate the keypoints at each frame through the telemetry buffer
+    telemetry = TelemetryBuffer(capacity=len(keypoint_attitudes))
+    for keypoint, attitude in keypoint_attitudes.items():
+        position = start_coord.offset_coordinate(step * keypoint, heading)
+        telemetry.append(keypoint, position.lat, position.lon, attitude['alt'],
+                         attitude['roll'], attitude['pitch'], attitude['yaw'] + heading)
+    poses = telemetry.interpolate(np.arange(count + 1))
 
     for i in range(count + 1):
-        if i == next_kp and next_kp < 20:
-            current_kp = next_kp
-            if next_kp < 20:
-                next_kp += 5
-        alt_slope = (keypoint_attitudes[next_kp]['alt'] - keypoint_attitudes[current_kp]['alt']) / (next_kp - current_kp)
-        yaw_slope = (keypoint_attitudes[next_kp]['yaw'] - keypoint_attitudes[current_kp]['yaw']) / (next_kp - current_kp)
-        pitch_slope = (keypoint_attitudes[next_kp]['pitch'] - keypoint_attitudes[current_kp]['pitch']) / (next_kp - current_kp)
-        roll_slope = (keypoint_attitudes[next_kp]['roll'] - keypoint_attitudes[current_kp]['roll']) / (next_kp - current_kp)
-        alt = round(keypoint_attitudes[current_kp]['alt'] + (i - current_kp) * alt_slope, 3)
-        yaw = round(keypoint_attitudes[current_kp]['yaw'] + (i - current_kp) * yaw_slope + heading, 3)
-        pitch = round(keypoint_attitudes[current_kp]['pitch'] + (i - current_kp) * pitch_slope, 3)
-        roll = round(keypoint_attitudes[current_kp]['roll'] + (i - current_kp) * roll_slope, 3)
-        attitude_list.append({'alt': alt, 'yaw': yaw, 'pitch': pitch, 'roll': roll})
+        attitude = {name: round(float(poses[column][i]), 3)
+                    for name, column in (('alt', 'alt'), ('yaw', 'heading'), ('pitch', 'pitch'), ('roll', 'roll'))}
+        coordinate = Coordinate(float(poses['lat'][i]), float(poses['lon'][i]), attitude['alt'], use_int=False)
+        yield i, coordinate, attitude
 
 
+def _make_geo_image(index, coordinate, attitude, image):
+    return GeoImage(
+        image=image,
+        coordinate=coordinate,
+        roll=attitude['roll'],
+        pitch=attitude['pitch'],
+        heading=attitude['yaw'],
+        res_x=RES_X,
+        res_y=RES_Y,
+        sensor_width=SENSOR_WIDTH,
+        sensor_height=SENSOR_HEIGHT,
+        fov=FOV,
+        index=index
+    )
 
 
-    step = distance / 20
+def _test_flight_frames(logger=None):
+    '''
+    Input:  logger - logger object for logging
+    Output: generator of (index, coordinate, attitude, image path) for each frame of the test flight
+            whose image is present in test_images/
+    '''
+    directory = os.path.join(os.path.abspath(os.path.dirname(__file__)), "test_images/")
+    for index, coordinate, attitude in _frame_telemetry():
+        image_path = os.path.join(directory, f"{index:04d}.png")
+        if not os.path.exists(image_path):
+            if logger:
+                logger.warning("Image %04d.png not found in %s", index, directory)
+            continue
+        yield index, coordinate, attitude, image_path
 
-    current_coord = start_coord
 
-    focal_length = 3.83
-    sensor_width = 6.29
-    sensor_height = 4.71
-    res_x = 4056
-    res_y = 3040
+def stream_geo_images(prefetch=8, workers=4, decode=True, frames=None, load=None, logger=None):
+    '''
+    Input:  prefetch - maximum number of frames decoded ahead of the consumer
+            workers - number of decoding threads
+            decode - if False, yield lazily loaded GeoImages without decoding any pixels
+            frames - iterable of (index, coordinate, attitude, source), defaults to the test flight
+            load - callable decoding a source into pixels, None if it cannot be decoded,
+                   defaults to cv2.imread
+            logger - logger object for logging
+    Output: generator of GeoImage objects, in frame order
 
-    directory = os.path.join(os.path.abspath(os.path.dirname(__file__)), "test_images/")
+    Frames are decoded ahead in a bounded thread pool (cv2 releases the GIL while decoding) and
+    telemetry is attached as each frame is yielded, so the first frame can be processed while later
+    frames are still decoding. At most `prefetch` decoded frames are held by the pipeline at once.
+    Frames that cannot be decoded are skipped.
 
-    geo_images = []
+    >>> from geo_core import Coordinate
+    >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+    >>> attitude = {'roll': 0, 'pitch': 0, 'yaw': 0}
+    >>> pixels = [np.full((3, 4, 3), i, dtype=np.uint8) for i in range(5)]
+    >>> pulled = []
+    >>> def frames():
+    ...     for i in range(5):
+    ...         pulled.append(i)
+    ...         yield i, coordinate.offset_coordinate(i, 90), attitude, i
+    >>> load = lambda i: None if i == 3 else pixels[i]
+    >>> stream = stream_geo_images(prefetch=2, workers=1, frames=frames(), load=load)
+    >>> first = next(stream)
+    >>> first.index, int(first.image[0, 0, 0]), pulled
+    (0, 0, [0, 1])
+    >>> [(image.index, int(image.image[0, 0, 0])) for image in stream], pulled
+    ([(1, 1), (2, 2), (4, 4)], [0, 1, 2, 3, 4])
+    '''
+    if frames is None:
+        frames = _test_flight_frames(logger)
+    if decode and load is None:
+        import cv2 # geometry-only callers never load it
+        load = cv2.imread
 
-    for i in range(count + 1):
-        current_coord.alt = attitude_list[i]['alt']
-        image = cv2.imread(os.path.join(directory, f"{i:04d}.png"))
-        if image is None:
-            print(f"Image {i:04d}.png not found in {directory}")
-            continue
-        new_geo_image = GeoImage(
-            image=image,
-            coordinate=current_coord,
-            roll=attitude_list[i]['roll'],
-            pitch=attitude_list[i]['pitch'],
-            heading=attitude_list[i]['yaw'],
-            res_x=res_x,
-            res_y=res_y,
-            sensor_width=sensor_width,
-            sensor_height=sensor_height,
-            fov=78.3
-        )
-        geo_images.append(new_geo_image)
-        current_coord = current_coord.offset_coordinate(step, heading)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def ready():
+            index, coordinate, attitude, source, future = pending.popleft()
+            image = future.result() if future is not None else source
+            if image is None:
+                if logger:
+                    logger.warning("Image %s could not be decoded", index)
+                return None
+            return _make_geo_image(index, coordinate, attitude, image)
+
+        for index, coordinate, attitude, source in frames:
+            future = pool.submit(load, source) if decode else None
+            pending.append((index, coordinate, attitude, source, future))
+
+            if len(pending) >= prefetch:
+                geo_image = ready()
+                if geo_image is not None:
+                    yield geo_image
+
+        while pending:
+            geo_image = ready()
+            if geo_image is not None:
+                yield geo_image
+
+
+def generate_geo_images():
+    '''
+    Output: list of lazily loaded GeoImage objects for the test flight
+    '''
+    return list(stream_geo_images(decode=False))
+
+
+class SimulatedMission:
+    def __init__(self, frames, truth, target_lat, target_lon, detections):
+        '''
+        frames: dict of per-frame columns as reported by telemetry: time (s), lat, lon (degrees),
+                alt (m), roll, pitch, yaw (degrees, the conventions of GeoImage)
+        truth: dict of the same columns holding the true poses the detections were rendered with
+        target_lat, target_lon: arrays of the ground truth target positions in degrees
+        detections: dict of detection columns, "frame" (frame index), "target" (target index), "x", "y" (pixels)
+        '''
+        self.frames = frames
+        self.truth = truth
+        self.target_lat = target_lat
+        self.target_lon = target_lon
+        self.detections = detections
+
+
+    def __len__(self):
+        return len(self.frames["time"])
+
+
+    def geo_images(self):
+        '''
+        Output: list of geometry-only GeoImage objects, one per frame, from the reported poses
+        '''
+        frames = self.frames
+        return [_make_geo_image(i, Coordinate(float(frames["lat"][i]), float(frames["lon"][i]), float(frames["alt"][i]), use_int=False),
+                                {name: float(frames[name][i]) for name in ("roll", "pitch", "yaw")}, None)
+                for i in range(len(self))]
+
+
+    def image_set(self, truth=False):
+        '''
+        Input:  truth - use the true poses instead of the reported ones
+        Output: GeoImageSet of the frames, built directly from the columns
+        '''
+        return _image_set(self.truth if truth else self.frames)
+
+
+def _image_set(columns):
+    '''
+    Input:  columns - dict of per-frame columns as in SimulatedMission.frames
+    Output: GeoImageSet with rotations and footprint bounds computed for all frames at once
+    '''
+    count = len(columns["time"])
+    camera = _make_geo_image(0, Coordinate(0, 0, 0, use_int=False), {"roll": 0, "pitch": 0, "yaw": 0}, None).camera
+    # angles as stored by GeoImage
+    roll = np.radians(-columns["roll"] % 360)
+    pitch = np.radians(columns["pitch"] % 360)
+    heading = np.radians(columns["yaw"] % 360)
+    image_set = GeoImageSet.from_columns(
+        {"lat": columns["lat"], "lon": columns["lon"], "alt": columns["alt"], "roll": roll, "pitch": pitch,
+         "heading": heading, "camera": np.zeros(count, dtype=np.int32), "index": np.arange(count, dtype=np.int64)},
+        rotation_matrix(roll, pitch, heading), np.full((count, 4), np.nan), [camera], [None] * count)
+    lat, lon = image_set.footprints()
+    image_set.bounds[:] = np.stack([lat.min(axis=1), lat.max(axis=1), lon.min(axis=1), lon.max(axis=1)], axis=1)
+    return image_set
+
+
+def simulate_mission(origin=(38.3155, -76.5509), width=300, length=600, track=0, alt=20, speed=12,
+                     side_overlap=0.3, forward_overlap=0.6, wind_speed=0, wind_direction=0,
+                     attitude_sigma=1.0, yaw_sigma=1.0, alt_sigma=0.3, telemetry_sigma=0.0,
+                     targets=100, pixel_sigma=0.0, seed=0):
+    '''
+    Simulate a lawnmower survey with geometry-only frames, ground truth targets and their detections.
+    Input:  origin - (lat, lon) of the corner where the survey starts, in degrees
+            width - extent of the survey across the survey lines in meters, lines are added to the right
+            length - length of each survey line in meters
+            track - direction of the first survey line in degrees clockwise from North
+            alt - nominal altitude above the ground in meters
+            speed - airspeed in meters per second
+            side_overlap, forward_overlap - fraction of the footprint shared by neighbouring lines and frames
+            wind_speed - wind speed in meters per second
+            wind_direction - direction the wind blows from in degrees clockwise from North
+            attitude_sigma - standard deviation of the roll and pitch of the aircraft in degrees
+            yaw_sigma - standard deviation of the yaw about the crab angle in degrees
+            alt_sigma - standard deviation of the altitude in meters
+            telemetry_sigma - standard deviation of the error of the reported roll, pitch and yaw in degrees
+            targets - number of ground truth targets spread uniformly over the survey area
+            pixel_sigma - standard deviation of the detector's pixel error
+            seed - random seed
+    Output: SimulatedMission
+
+    Frames are spaced so that the footprints overlap as requested. With a crosswind the aircraft
+    flies the lines crabbed into the wind, so the frames are yawed away from the track, and the
+    ground speed (and frame times) follow the headwind on each line. Everything is generated as
+    arrays, and detections are rendered by projecting every target into the true pose of every
+    frame whose footprint may contain it.
+
+    >>> mission = simulate_mission(width=100, length=200, wind_speed=5, wind_direction=90, targets=20, seed=1)
+    >>> len(mission), len(mission.target_lat)
+    (210, 20)
+
+    A wind from the East crabs the aircraft about 24.6 degrees into it on both the North and South lines.
+
+    >>> yaw = mission.truth["yaw"].reshape(7, 30)
+    >>> [round(float(np.median(line))) for line in yaw[:2]]
+    [24, 155]
+    >>> image_set = mission.image_set()
+    >>> frame, target = mission.detections["frame"][0], mission.detections["target"][0]
+    >>> lat, lon, _ = image_set.get_coordinates([frame], mission.detections["x"][:1], mission.detections["y"][:1])
+    >>> error = Coordinate(float(lat[0]), float(lon[0]), 0, use_int=False).distance_to(
+    ...     Coordinate(float(mission.target_lat[target]), float(mission.target_lon[target]), 0, use_int=False))
+    >>> bool(error < 1e-6), len(mission.detections["frame"]) > len(mission.target_lat)
+    (True, True)
+
+    Overlaps must leave a gap between lines and frames, and the aircraft must make headway on every line.
+
+    >>> simulate_mission(side_overlap=1)
+    Traceback (most recent call last):
+    ...
+    ValueError: side_overlap and forward_overlap must be in [0, 1), got 1 and 0.6
+    >>> simulate_mission(speed=12, wind_speed=15)
+    Traceback (most recent call last):
+    ...
+    ValueError: wind_speed 15 m/s leaves no ground speed along the survey lines at an airspeed of 12 m/s
+    '''
+    if not (0 <= side_overlap < 1 and 0 <= forward_overlap < 1):
+        raise ValueError(f"side_overlap and forward_overlap must be in [0, 1), got {side_overlap} and {forward_overlap}")
+    rng = np.random.default_rng(seed)
+    camera = _make_geo_image(0, Coordinate(0, 0, 0, use_int=False), {"roll": 0, "pitch": 0, "yaw": 0}, None).camera
+
+    # ground footprint of a nadir frame, the equidistant model maps angles linearly to pixels
+    footprint_width = 2 * alt * math.tan(camera.fov * camera.res_x / camera.res_diagonal / 2)
+    footprint_height = 2 * alt * math.tan(camera.fov * camera.res_y / camera.res_diagonal / 2)
+    line_spacing = footprint_width * (1 - side_overlap)
+    frame_spacing = footprint_height * (1 - forward_overlap)
+    lines = int(math.ceil(width / line_spacing)) + 1
+    per_line = int(math.ceil(length / frame_spacing)) + 1
+
+    # along and across track positions, every other line flown back
+    line = np.repeat(np.arange(lines), per_line)
+    step = np.tile(np.arange(per_line), lines)
+    backwards = line % 2 == 1
+    along = np.where(backwards, per_line - 1 - step, step) * frame_spacing
+    across = line * line_spacing
+    line_track = np.radians(track + np.where(backwards, 180.0, 0.0))
+
+    # crab into the crosswind, the wind blows towards wind_direction + 180
+    wind_to = math.radians(wind_direction + 180)
+    relative = wind_to - line_track
+    crosswind = wind_speed * np.sin(relative) # positive pushes the aircraft to the right of its track
+    tailwind = wind_speed * np.cos(relative)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crab = np.arcsin(np.clip(crosswind / speed, -1, 1))
+        ground_speed = speed * np.cos(crab) + tailwind
+    if not (np.abs(crosswind) < speed).all() or not (ground_speed > 0).all():
+        raise ValueError(f"wind_speed {wind_speed} m/s leaves no ground speed along the survey lines at an airspeed of {speed} m/s")
+
+    # times along the lines, with a half circle turn between lines
+    distance_on_line = np.where(backwards, (per_line - 1) * frame_spacing - along, along)
+    line_start = np.concatenate([[0.0], np.cumsum(((per_line - 1) * frame_spacing + math.pi * line_spacing / 2)
+                                                  / (ground_speed[::per_line][:-1]))])
+    time = line_start[line] + distance_on_line / ground_speed
+
+    # position on the ground, rotated into the track direction
+    track_radians = math.radians(track)
+    east = along * math.sin(track_radians) + across * math.cos(track_radians)
+    north = along * math.cos(track_radians) - across * math.sin(track_radians)
+    lat, lon = _offset_coordinates(origin[0], origin[1], np.hypot(east, north), np.arctan2(east, north))
+
+    count = lines * per_line
+    truth = {
+        "time": time,
+        "lat": lat,
+        "lon": lon,
+        "alt": alt + rng.normal(0, alt_sigma, count),
+        "roll": rng.normal(0, attitude_sigma, count),
+        "pitch": rng.normal(0, attitude_sigma, count),
+        "yaw": (np.degrees(line_track - crab) + rng.normal(0, yaw_sigma, count)) % 360,
+    }
+    frames = dict(truth)
+    for name in ("roll", "pitch", "yaw"):
+        frames[name] = truth[name] + rng.normal(0, telemetry_sigma, count)
+    frames["yaw"] %= 360
+
+    # ground truth targets spread over the survey area
+    target_along = rng.uniform(0, (per_line - 1) * frame_spacing, targets)
+    target_across = rng.uniform(0, (lines - 1) * line_spacing, targets)
+    target_east = target_along * math.sin(track_radians) + target_across * math.cos(track_radians)
+    target_north = target_along * math.cos(track_radians) - target_across * math.sin(track_radians)
+    target_lat, target_lon = _offset_coordinates(origin[0], origin[1], np.hypot(target_east, target_north),
+                                                 np.arctan2(target_east, target_north))
 
-    return geo_images
+    # render the detections through the true poses
+    image_set = _image_set(truth)
+    rows, target = np.nonzero(image_set.contains(target_lat, target_lon))
+    x, y = _geo_to_pixels(image_set._intrinsics(rows), image_set._poses(rows), target_lat[target], target_lon[target])
+    x = x + rng.normal(0, pixel_sigma, x.size)
+    y = y + rng.normal(0, pixel_sigma, y.size)
+    seen = (0 <= x) & (x < camera.res_x) & (0 <= y) & (y < camera.res_y)
+    detections = {"frame": rows[seen], "target": target[seen], "x": x[seen], "y": y[seen]}
 
+    return SimulatedMission(frames, truth, target_lat, target_lon, detections)
 
 
 if __name__ == "__main__":
+    import cv2
     geo_images = generate_geo_images()
     print(geo_images[16].get_coordinates(0, 0))
     print(geo_images[16].get_coordinates(0, 3040))
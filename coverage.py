@@ -0,0 +1,211 @@
+'''
+coverage.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides a rasterized coverage map of the search area, updated incrementally as GeoImages arrive.
+Version: v1.0.0
+'''
+
+import math
+import numpy as np
+from geo_core import METERS_PER_DEGREE, _geo_to_pixels
+
+
+class CoverageMap:
+    def __init__(self, lat_min, lat_max, lon_min, lon_max, cell_size=5, logger=None):
+        '''
+        lat_min, lat_max, lon_min, lon_max: bounding box of the search area in degrees
+        cell_size: size of the grid cells in meters
+        logger: logger object for logging
+
+        Every cell keeps the number of frames that saw its center, the index of the frame that
+        saw it closest to the optical axis, and that frame's off-axis score (0 at the image
+        center, 1 at the corners).
+
+        >>> from geo_core import Coordinate
+        >>> from geo_image import GeoImage
+        >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+        >>> images = [GeoImage(None, coordinate.offset_coordinate(10 * i, 90),
+        ...                    0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3, index=i) for i in range(3)]
+        >>> corner = coordinate.offset_coordinate(60, 225)
+        >>> coverage = CoverageMap(corner.lat, corner.lat + 0.001, corner.lon, corner.lon + 0.001, cell_size=2)
+        >>> coverage.shape
+        (56, 44)
+        >>> [coverage.add(image) > 0 for image in images]
+        [True, True, True]
+        >>> targets = [coordinate.offset_coordinate(d, 90) for d in (0, 5, 15, 100)]
+        >>> lat, lon = [t.lat for t in targets], [t.lon for t in targets]
+        >>> coverage.view_count(lat, lon).tolist(), coverage.best_frame_at(lat, lon).tolist()
+        ([2, 2, 2, 0], [0, 0, 1, -1])
+        >>> uncovered_lat, uncovered_lon = coverage.uncovered()
+        >>> bool(uncovered_lat.size == coverage.counts.size - np.count_nonzero(coverage.counts))
+        True
+        '''
+        self.lat_min = lat_min
+        self.lon_min = lon_min
+        self.cell_size = cell_size
+        self.logger = logger
+        self.lat_step = cell_size / METERS_PER_DEGREE
+        self.lon_step = cell_size / (METERS_PER_DEGREE * math.cos(math.radians((lat_min + lat_max) / 2)))
+
+        shape = (max(1, math.ceil((lat_max - lat_min) / self.lat_step)),
+                 max(1, math.ceil((lon_max - lon_min) / self.lon_step)))
+        self.counts = np.zeros(shape, dtype=np.uint16)
+        self.best_frame = np.full(shape, -1, dtype=np.int32)
+        self.best_score = np.full(shape, np.inf, dtype=np.float32)
+        self.frames = 0
+
+
+    @property
+    def shape(self):
+        return self.counts.shape
+
+
+    @property
+    def coverage(self):
+        '''
+        Fraction of the cells seen by at least one frame.
+        '''
+        return np.count_nonzero(self.counts) / self.counts.size
+
+
+    def cell_centers(self, rows, cols):
+        '''
+        Input:  rows, cols - array-likes of cell indices
+        Output: lat, lon - arrays of cell center coordinates in degrees
+        '''
+        lat = self.lat_min + (np.asarray(rows) + 0.5) * self.lat_step
+        lon = self.lon_min + (np.asarray(cols) + 0.5) * self.lon_step
+        return lat, lon
+
+
+    def _cells(self, lat, lon):
+        '''
+        Input:  lat, lon - array-likes of coordinates in degrees
+        Output: rows, cols - integer arrays of cell indices
+                inside - boolean array, True where the coordinate falls in the search area
+        '''
+        rows = np.floor((np.asarray(lat, dtype=np.float64) - self.lat_min) / self.lat_step).astype(np.int64)
+        cols = np.floor((np.asarray(lon, dtype=np.float64) - self.lon_min) / self.lon_step).astype(np.int64)
+        inside = (0 <= rows) & (rows < self.shape[0]) & (0 <= cols) & (cols < self.shape[1])
+        return np.where(inside, rows, 0), np.where(inside, cols, 0), inside
+
+
+    def add(self, image, samples_per_edge=4):
+        '''
+        Rasterize the footprint of an image into the map.
+        Input:  image - GeoImage object
+                samples_per_edge - number of points sampled along each image edge for the footprint bounding box
+        Output: number of cells whose center the image sees
+
+        Only the cells under the footprint's bounding box are projected, so the cost does not
+        depend on the size of the search area.
+        '''
+        lat, lon = image.footprint(samples_per_edge)
+        self.frames += 1
+        if np.isnan(lat).any():
+            # the footprint reaches the horizon, fall back to the whole search area
+            row_min, col_min = 0, 0
+            row_max, col_max = self.shape[0] - 1, self.shape[1] - 1
+        else:
+            # pad by one cell so that curved edges between the samples stay inside the window
+            row_min = max(0, math.floor((lat.min() - self.lat_min) / self.lat_step) - 1)
+            row_max = min(self.shape[0] - 1, math.floor((lat.max() - self.lat_min) / self.lat_step) + 1)
+            col_min = max(0, math.floor((lon.min() - self.lon_min) / self.lon_step) - 1)
+            col_max = min(self.shape[1] - 1, math.floor((lon.max() - self.lon_min) / self.lon_step) + 1)
+        if row_min > row_max or col_min > col_max:
+            return 0
+
+        rows, cols = np.arange(row_min, row_max + 1), np.arange(col_min, col_max + 1)
+        cell_lat, cell_lon = self.cell_centers(rows[:, None], cols[None, :])
+        x, y = _geo_to_pixels(image.camera, image.pose, cell_lat, cell_lon)
+        with np.errstate(invalid="ignore"):
+            seen = (0 <= x) & (x < image.res_x) & (0 <= y) & (y < image.res_y)
+        score = np.hypot(x - image.res_x / 2, y - image.res_y / 2) / (image.res_diagonal / 2)
+
+        window = (slice(row_min, row_max + 1), slice(col_min, col_max + 1))
+        self.counts[window] += seen
+        better = seen & (score < self.best_score[window])
+        self.best_frame[window][better] = image.index
+        self.best_score[window][better] = score[better]
+
+        cells = int(np.count_nonzero(seen))
+        if self.logger:
+            self.logger.info("Image %s covers %s cells", image.index, cells)
+        return cells
+
+
+    def uncovered(self):
+        '''
+        Output: lat, lon - arrays of the centers of the cells no frame has seen, row by row
+        '''
+        rows, cols = np.nonzero(self.counts == 0)
+        return self.cell_centers(rows, cols)
+
+
+    def view_count(self, lat, lon):
+        '''
+        Input:  lat, lon - array-likes of coordinates in degrees
+        Output: integer array of the number of frames that saw each coordinate's cell, 0 outside the search area
+        '''
+        rows, cols, inside = self._cells(lat, lon)
+        return np.where(inside, self.counts[rows, cols], 0)
+
+
+    def best_frame_at(self, lat, lon):
+        '''
+        Input:  lat, lon - array-likes of coordinates in degrees
+        Output: integer array of the index of the frame that saw each coordinate's cell closest
+                to its optical axis, -1 where no frame saw it or outside the search area
+        '''
+        rows, cols, inside = self._cells(lat, lon)
+        return np.where(inside, self.best_frame[rows, cols], -1)
+
+
+    def save(self, path):
+        '''
+        Write a compressed snapshot of the map.
+        Input:  path - file path, numpy appends .npz if missing
+        '''
+        np.savez_compressed(path, counts=self.counts, best_frame=self.best_frame, best_score=self.best_score,
+                            grid=np.array([self.lat_min, self.lon_min, self.lat_step, self.lon_step, self.cell_size]),
+                            frames=self.frames)
+
+
+    @classmethod
+    def load(cls, path, logger=None):
+        '''
+        Read a snapshot written by save.
+        Input:  path - .npz file path
+                logger - logger object for logging
+        Output: CoverageMap object
+
+        >>> import os, tempfile
+        >>> from geo_core import Coordinate
+        >>> from geo_image import GeoImage
+        >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+        >>> corner = coordinate.offset_coordinate(60, 225)
+        >>> coverage = CoverageMap(corner.lat, corner.lat + 0.001, corner.lon, corner.lon + 0.001, cell_size=2)
+        >>> coverage.add(GeoImage(None, coordinate, 0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3, index=7)) > 0
+        True
+        >>> with tempfile.TemporaryDirectory() as directory:
+        ...     coverage.save(os.path.join(directory, "coverage"))
+        ...     loaded = CoverageMap.load(os.path.join(directory, "coverage.npz"))
+        >>> loaded.shape, loaded.frames, loaded.cell_size
+        ((56, 44), 1, 2.0)
+        >>> all(np.array_equal(getattr(loaded, name), getattr(coverage, name)) for name in ("counts", "best_frame", "best_score"))
+        True
+        >>> loaded.best_frame_at([coordinate.lat], [coordinate.lon]).tolist()
+        [7]
+        '''
+        with np.load(path) as snapshot:
+            coverage = cls.__new__(cls)
+            coverage.lat_min, coverage.lon_min, coverage.lat_step, coverage.lon_step, coverage.cell_size = \
+                snapshot["grid"].tolist()
+            coverage.counts = snapshot["counts"]
+            coverage.best_frame = snapshot["best_frame"]
+            coverage.best_score = snapshot["best_score"]
+            coverage.frames = int(snapshot["frames"])
+        coverage.logger = logger
+        return coverage
@@ -0,0 +1,174 @@
+'''
+footprint_index.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides a spatial index over GeoImage ground footprints, answering "which images see this point" queries.
+Version: v1.0.0
+'''
+
+import math
+from collections import defaultdict
+import numpy as np
+from geo_core import METERS_PER_DEGREE
+
+
+class FootprintIndex:
+    def __init__(self, cell_size=25, samples_per_edge=4, logger=None):
+        '''
+        cell_size: size of the grid cells in meters
+        samples_per_edge: number of points sampled along each image edge for the footprint polygon
+        logger: logger object for logging
+
+        Footprints are bucketed by their bounding box into a uniform metric grid. The grid is
+        unbounded, so images can be inserted as they arrive without knowing the survey area.
+        Footprints that reach the horizon have no bounding box, and those images are checked for
+        every query instead.
+
+        >>> from geo_core import Coordinate
+        >>> from geo_image import GeoImage
+        >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+        >>> index = FootprintIndex()
+        >>> index.insert(GeoImage(None, coordinate, 0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3, index=0))
+        0
+        >>> index.insert(GeoImage(None, coordinate, 0, 80, 0, 4056, 3040, 6.29, 4.71, 78.3, index=1))
+        1
+        >>> far = coordinate.offset_coordinate(150, 0)
+        >>> bool(index.images[1].contains_batch(far.lat, far.lon)), [image.index for image in index.query(far.lat, far.lon)]
+        (True, [1])
+        >>> index.query_batch([coordinate.lat, far.lat], [coordinate.lon, far.lon])
+        [[0], [1]]
+        '''
+        self.cell_size = cell_size
+        self.samples_per_edge = samples_per_edge
+        self.logger = logger
+        self.images = []
+        self.footprints = []
+        self.bounds = [] # (lat_min, lat_max, lon_min, lon_max) per image
+        self._cells = defaultdict(list)
+        self._unbounded = [] # positions of the images whose footprint reaches the horizon
+        self._lon_scale = None # meters per degree longitude, fixed at the first insertion
+
+
+    def __len__(self):
+        return len(self.images)
+
+
+    def _cell(self, lat, lon):
+        '''
+        Input:  lat, lon - array-likes of coordinates in degrees
+        Output: row, col - integer arrays of grid cell indices
+        '''
+        row = np.floor(np.asarray(lat) * METERS_PER_DEGREE / self.cell_size).astype(np.int64)
+        col = np.floor(np.asarray(lon) * self._lon_scale / self.cell_size).astype(np.int64)
+        return row, col
+
+
+    def insert(self, image):
+        '''
+        Add an image to the index.
+        Input:  image - GeoImage object
+        Output: position of the image in the index
+        '''
+        lat, lon = image.footprint(self.samples_per_edge)
+        if self._lon_scale is None:
+            self._lon_scale = METERS_PER_DEGREE * math.cos(math.radians(image.coordinate.lat))
+
+        position = len(self.images)
+        self.images.append(image)
+        self.footprints.append((lat, lon))
+        if np.isnan(lat).any():
+            self.bounds.append((-np.inf, np.inf, -np.inf, np.inf))
+            self._unbounded.append(position)
+            if self.logger:
+                self.logger.warning("Footprint of image %s reaches the horizon, it is checked for every query", image.index)
+            return position
+
+        # pad the bounding box so that curved edges between the samples stay inside it
+        lat_pad = (lat.max() - lat.min()) * 0.02
+        lon_pad = (lon.max() - lon.min()) * 0.02
+        bounds = (lat.min() - lat_pad, lat.max() + lat_pad, lon.min() - lon_pad, lon.max() + lon_pad)
+        self.bounds.append(bounds)
+
+        (row_min, row_max), (col_min, col_max) = self._cell(bounds[:2], bounds[2:])
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                self._cells[(row, col)].append(position)
+
+        if self.logger:
+            self.logger.info("Indexed image %s at position %s", image.index, position)
+
+        return position
+
+
+    def candidates(self, lat, lon):
+        '''
+        Find the images whose footprint bounding box may contain a coordinate.
+        Input:  lat, lon - coordinate in degrees
+        Output: list of index positions, in insertion order
+        '''
+        if not self.images:
+            return []
+        row, col = self._cell(lat, lon)
+        positions = self._cells.get((int(row), int(col)), [])
+        if self._unbounded:
+            positions = sorted(positions + self._unbounded)
+        return [p for p in positions
+                if self.bounds[p][0] <= lat <= self.bounds[p][1] and self.bounds[p][2] <= lon <= self.bounds[p][3]]
+
+
+    def query(self, lat, lon):
+        '''
+        Find the images that contain a coordinate.
+        Input:  lat, lon - coordinate in degrees
+        Output: list of GeoImage objects, in insertion order
+        '''
+        found = []
+        for position in self.candidates(lat, lon):
+            image = self.images[position]
+            if image.contains_batch(lat, lon):
+                found.append(image)
+        return found
+
+
+    def query_batch(self, lat, lon):
+        '''
+        Find the images that contain each of many coordinates.
+        Input:  lat, lon - 1-D array-likes of coordinates in degrees
+        Output: list with one list of index positions per coordinate, in insertion order
+
+        Candidates are gathered per grid cell and every candidate image is checked
+        exactly with a single vectorized projection of the points it may contain.
+        '''
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        result = [[] for _ in range(lat.size)]
+        if not self.images or lat.size == 0:
+            return result
+
+        # group the points by the candidate images of their cell
+        rows, cols = self._cell(lat, lon)
+        points_per_image = defaultdict(list)
+        cells, inverse = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        for cell, (row, col) in enumerate(cells):
+            positions = self._cells.get((int(row), int(col)))
+            if positions:
+                points = np.flatnonzero(inverse == cell)
+                for position in positions:
+                    points_per_image[position].append(points)
+        for position in self._unbounded:
+            points_per_image[position].append(np.arange(lat.size))
+
+        for position in sorted(points_per_image):
+            points = np.concatenate(points_per_image[position])
+            lat_min, lat_max, lon_min, lon_max = self.bounds[position]
+            points = points[(lat_min <= lat[points]) & (lat[points] <= lat_max)
+                            & (lon_min <= lon[points]) & (lon[points] <= lon_max)]
+            if points.size == 0:
+                continue
+            inside = self.images[position].contains_batch(lat[points], lon[points])
+            for point in points[inside]:
+                result[point].append(position)
+
+        return result
@@ -0,0 +1,557 @@
+'''
+geo_core.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides the geometry-only core of geolocation (coordinates, camera intrinsics, poses and projection math) with numpy as its only dependency.
+Version: v1.0.0
+'''
+
+import math
+import numpy as np
+
+EARTH_RADIUS = 6371000 # mean Earth radius in meters, used by the vectorized offset math
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180 # meters per degree of latitude
+ENU_MAX_RANGE = 250 # meters, ground points farther than this from the sensor use the exact spherical path
+UNDISTORT_STEP = 16 # pixels between the nodes of the undistortion lookup table
+
+
+class Coordinate:
+    def __init__(self, lat, lon, alt=0, use_int=True):
+        '''
+        lat, lon: position in degrees, or in degrees * 1e7 if use_int is True (MAVLink integer convention)
+        alt: altitude in meters
+        use_int: True if lat and lon are given as integers
+
+        Lightweight coordinate compatible with the MAVez Coordinate API used by this package,
+        on the same spherical earth as the vectorized projection math.
+
+        >>> start = Coordinate(38.3155, -76.5509, 20, use_int=False)
+        >>> end = start.offset_coordinate(100, 45)
+        >>> round(start.distance_to(end), 6), round(start.bearing_to(end), 6)
+        (100.0, 45.0)
+        >>> Coordinate(383155000, -765509000, 20).lat
+        38.3155
+        '''
+        if use_int:
+            lat, lon = lat / 1e7, lon / 1e7
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+
+
+    def __str__(self):
+        return f"({self.lat}, {self.lon}, {self.alt})"
+
+    __repr__ = __str__
+
+
+    def offset_coordinate(self, offset, heading):
+        '''
+        Input:  offset - distance in meters
+                heading - bearing in degrees clockwise from North
+        Output: Coordinate at the offset along the great circle, at the same altitude
+        '''
+        lat, lon = _offset_coordinates(self.lat, self.lon, offset, math.radians(heading))
+        return Coordinate(float(lat), float(lon), self.alt, use_int=False)
+
+
+    def distance_to(self, other):
+        '''
+        Input:  other - Coordinate
+        Output: great circle distance in meters
+        '''
+        return float(_distance_bearing(self.lat, self.lon, other.lat, other.lon)[0])
+
+
+    def bearing_to(self, other):
+        '''
+        Input:  other - Coordinate
+        Output: initial bearing in degrees clockwise from North, in [0, 360)
+        '''
+        return math.degrees(float(_distance_bearing(self.lat, self.lon, other.lat, other.lon)[1])) % 360
+
+
+class CameraModel:
+    _shared = {}
+
+    def __init__(self, res_x, res_y, sensor_width, sensor_height, fov, distortion=None):
+        '''
+        res_x: resolution of the sensor in the x direction (pixels)
+        res_y: resolution of the sensor in the y direction (pixels)
+        sensor_width: width of the sensor in mm
+        sensor_height: height of the sensor in mm
+        fov: diagonal field of view of the sensor, in degrees or radians
+        distortion: lens distortion coefficients (k1, k2, p1, p2, k3), None or all zero for an ideal lens
+
+        Intrinsics of a camera. Pixels map linearly to the angle off the optical axis
+        (equidistant model), with the diagonal of the sensor spanning the field of view.
+
+        Distortion follows the Brown-Conrady model, with pixel offsets from the image center
+        normalized by half the image diagonal. It moves an ideal pixel to where the lens
+        actually images it.
+        '''
+        self.res_x = res_x
+        self.res_y = res_y
+        self.res_diagonal = (res_x ** 2 + res_y ** 2) ** 0.5
+        self.sensor_width = sensor_width
+        self.sensor_height = sensor_height
+        self.sensor_diagonal = math.sqrt(sensor_width ** 2 + sensor_height ** 2)
+
+        # convert fov to radians
+        if fov > math.pi*2: # if fov is in degrees
+            self.fov = math.radians(fov)
+        else:
+            self.fov = fov
+
+        if distortion is not None and any(distortion):
+            self.distortion = tuple(float(c) for c in distortion) + (0.0,) * (5 - len(distortion))
+        else:
+            self.distortion = None
+        self._undistort_table = None
+        self._undistort_maps = None
+
+
+    @classmethod
+    def shared(cls, res_x, res_y, sensor_width, sensor_height, fov, distortion=None):
+        '''
+        Output: the CameraModel shared by every frame with these intrinsics
+
+        Models are looked up by their normalized key, so the fov in degrees or radians and
+        padded, truncated or all zero distortion coefficients give the same model.
+
+        >>> camera = CameraModel.shared(4056, 3040, 6.29, 4.71, 78.3, distortion=(-0.2,))
+        >>> camera is CameraModel.shared(4056, 3040, 6.29, 4.71, math.radians(78.3), distortion=(-0.2, 0, 0, 0, 0))
+        True
+        >>> CameraModel.shared(4056, 3040, 6.29, 4.71, 78.3, (0, 0, 0, 0, 0)) is CameraModel.shared(4056, 3040, 6.29, 4.71, 78.3)
+        True
+        '''
+        camera = cls(res_x, res_y, sensor_width, sensor_height, fov, distortion)
+        return cls._shared.setdefault(camera.key, camera)
+
+
+    @property
+    def key(self):
+        return (self.res_x, self.res_y, self.sensor_width, self.sensor_height, self.fov, self.distortion)
+
+
+    def distort_pixels(self, x, y):
+        '''
+        Input:  x, y - array-likes of ideal pixel coordinates
+        Output: x, y - arrays of the pixel coordinates the lens images them at
+        '''
+        if self.distortion is None:
+            return np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        k1, k2, p1, p2, k3 = self.distortion
+        half = self.res_diagonal / 2
+        a = (np.asarray(x, dtype=np.float64) - self.res_x / 2) / half
+        b = (np.asarray(y, dtype=np.float64) - self.res_y / 2) / half
+        r2 = a * a + b * b
+        radial = 1 + r2 * (k1 + r2 * (k2 + r2 * k3))
+        a, b = (a * radial + 2 * p1 * a * b + p2 * (r2 + 2 * a * a),
+                b * radial + p1 * (r2 + 2 * b * b) + 2 * p2 * a * b)
+        return a * half + self.res_x / 2, b * half + self.res_y / 2
+
+
+    def undistort_pixels(self, x, y):
+        '''
+        Input:  x, y - array-likes of pixel coordinates in the image
+        Output: x, y - arrays of the corresponding ideal pixel coordinates
+
+        Bilinear lookup in a table of the inverse distortion, solved once per camera on a grid
+        every UNDISTORT_STEP pixels. Pixels outside the image are clamped to its edge.
+
+        >>> camera = CameraModel(4056, 3040, 6.29, 4.71, 78.3, distortion=(-0.2, 0.05, 0.001, -0.001, 0))
+        >>> ideal_x, ideal_y = np.array([10.0, 2028.0, 3000.5, 4040.0]), np.array([20.0, 1520.0, 500.25, 3030.0])
+        >>> x, y = camera.undistort_pixels(*camera.distort_pixels(ideal_x, ideal_y))
+        >>> bool(np.abs(x - ideal_x).max() < 0.05 and np.abs(y - ideal_y).max() < 0.05)
+        True
+        '''
+        if self.distortion is None:
+            return np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        table_x, table_y = self._undistortion_table()
+
+        # position in the table, clamped so that the upper neighbour exists
+        gx = np.clip(np.asarray(x, dtype=np.float64) / UNDISTORT_STEP, 0, table_x.shape[1] - 1 - 1e-9)
+        gy = np.clip(np.asarray(y, dtype=np.float64) / UNDISTORT_STEP, 0, table_x.shape[0] - 1 - 1e-9)
+        col, row = gx.astype(np.intp), gy.astype(np.intp)
+        fx, fy = gx - col, gy - row
+
+        def lookup(table):
+            top = table[row, col] * (1 - fx) + table[row, col + 1] * fx
+            bottom = table[row + 1, col] * (1 - fx) + table[row + 1, col + 1] * fx
+            return top * (1 - fy) + bottom * fy
+
+        return lookup(table_x), lookup(table_y)
+
+
+    def _undistortion_table(self):
+        '''
+        Output: table_x, table_y - ideal pixel coordinates at every UNDISTORT_STEP pixels of the image
+        '''
+        if self._undistort_table is None:
+            nodes_x = np.arange(math.ceil(self.res_x / UNDISTORT_STEP) + 1) * UNDISTORT_STEP
+            nodes_y = np.arange(math.ceil(self.res_y / UNDISTORT_STEP) + 1) * UNDISTORT_STEP
+            observed_x, observed_y = np.meshgrid(nodes_x.astype(np.float64), nodes_y.astype(np.float64))
+
+            # fixed point iteration, converges for the small distortions of real lenses
+            ideal_x, ideal_y = observed_x.copy(), observed_y.copy()
+            for _ in range(50):
+                distorted_x, distorted_y = self.distort_pixels(ideal_x, ideal_y)
+                ideal_x += observed_x - distorted_x
+                ideal_y += observed_y - distorted_y
+            self._undistort_table = (ideal_x, ideal_y)
+        return self._undistort_table
+
+
+    def undistortion_maps(self):
+        '''
+        Output: map_1, map_2 - fixed point maps for cv2.remap producing an undistorted frame at full resolution,
+                three quarters of the memory of float32 maps
+
+        The maps are built once per camera, and frames with equal intrinsics share them through
+        CameraModel.shared.
+
+        >>> camera = CameraModel.shared(406, 304, 6.29, 4.71, 78.3, distortion=(-0.2, 0.05))
+        >>> maps = camera.undistortion_maps()
+        >>> maps is camera.undistortion_maps(), maps is CameraModel.shared(406, 304, 6.29, 4.71, 78.3, (-0.2, 0.05, 0)).undistortion_maps()
+        (True, True)
+        >>> maps[0].shape, maps[0].dtype.name
+        ((304, 406, 2), 'int16')
+        '''
+        if self._undistort_maps is None:
+            import cv2 # loaded only when whole frames are remapped
+            x, y = np.meshgrid(np.arange(self.res_x) + 0.5, np.arange(self.res_y) + 0.5)
+            map_x, map_y = self.distort_pixels(x, y)
+            # cv2.remap addresses pixel centers at whole numbers
+            self._undistort_maps = cv2.convertMaps((map_x - 0.5).astype(np.float32), (map_y - 0.5).astype(np.float32),
+                                                   cv2.CV_16SC2)
+        return self._undistort_maps
+
+
+    def undistort_image(self, image):
+        '''
+        Input:  image - frame decoded at the sensor resolution
+        Output: frame as seen through an ideal lens, black where it falls outside the original
+
+        >>> image = np.random.default_rng(0).integers(0, 256, (304, 406, 3), dtype=np.uint8)
+        >>> ideal = CameraModel(406, 304, 6.29, 4.71, 78.3, distortion=(0, 0, 0, 0, 0))
+        >>> bool(np.array_equal(ideal.undistort_image(image), image))
+        True
+        >>> barrel = CameraModel(406, 304, 6.29, 4.71, 78.3, distortion=(-0.2,))
+        >>> bool(np.array_equal(barrel.undistort_image(image), image))
+        False
+        '''
+        import cv2 # loaded only when whole frames are remapped
+        map_1, map_2 = self.undistortion_maps()
+        return cv2.remap(image, map_1, map_2, cv2.INTER_LINEAR)
+
+
+    def pixels_to_rays(self, x, y):
+        '''
+        Input:  x, y - array-likes of pixel coordinates
+        Output: array of unit rays in the camera frame (x right, y towards the top of the image, z along the optical axis)
+        '''
+        return _pixels_to_rays(self, x, y)
+
+
+    def rays_to_pixels(self, rays):
+        '''
+        Input:  rays - array of rays in the camera frame
+        Output: x, y - arrays of fractional pixel coordinates, NaN for rays behind the camera
+        '''
+        return _rays_to_pixels(self, rays)
+
+
+class Pose:
+    def __init__(self, lat, lon, alt, roll, pitch, heading, rotation=None):
+        '''
+        lat, lon: position of the sensor in degrees
+        alt: altitude of the sensor above the ground in meters
+        roll: tilt of the optical axis to the right of the craft in radians
+        pitch: tilt of the optical axis towards the front of the craft in radians
+        heading: heading of the craft in radians clockwise from North
+        rotation: precomputed rotation matrix, computed from the attitude if not given
+
+        Position and attitude of a frame, with the camera to world rotation and the scale of the
+        local East-North tangent plane cached.
+        '''
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+        self.roll = roll
+        self.pitch = pitch
+        self.heading = heading
+        self.rotation = rotation_matrix(roll, pitch, heading) if rotation is None else rotation
+        self.meters_per_degree_lon = METERS_PER_DEGREE * np.cos(np.radians(lat))
+        self._rows = None
+
+
+    @classmethod
+    def from_degrees(cls, coordinate, roll, pitch, heading):
+        '''
+        Input:  coordinate - Coordinate of the sensor, altitude above ground in meters
+                roll, pitch, heading - attitude of the sensor in degrees, as given to GeoImage
+        Output: Pose with the attitude in the stored conventions
+        '''
+        return cls(coordinate.lat, coordinate.lon, coordinate.alt,
+                   math.radians((-roll)%360), # Convert from degrees to radians
+                   math.radians((pitch)%360),
+                   math.radians((heading)%360))
+
+
+    @property
+    def rows(self):
+        '''
+        Rotation matrix as nested tuples, for the scalar projection paths.
+        '''
+        if self._rows is None:
+            self._rows = tuple(tuple(row) for row in self.rotation.tolist())
+        return self._rows
+
+
+def rotation_matrix(roll, pitch, heading):
+    '''
+    Input:  roll, pitch, heading - attitude in radians as stored by Pose, scalars or arrays
+    Output: rotation matrix of shape (..., 3, 3) from the camera frame to the world frame (East, North, Down)
+
+    The camera is rolled, then pitched, then turned to the heading.
+    '''
+    roll, pitch, heading = np.broadcast_arrays(np.asarray(roll, dtype=np.float64),
+                                               np.asarray(pitch, dtype=np.float64),
+                                               np.asarray(heading, dtype=np.float64))
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    ch, sh = np.cos(heading), np.sin(heading)
+    zero, one = np.zeros_like(roll), np.ones_like(roll)
+
+    # columns are the camera axes (right, top of image, optical axis) expressed in the parent frame
+    roll_matrix = np.stack([np.stack([cr, zero, sr], -1), np.stack([zero, one, zero], -1), np.stack([-sr, zero, cr], -1)], -2)
+    pitch_matrix = np.stack([np.stack([one, zero, zero], -1), np.stack([zero, cp, sp], -1), np.stack([zero, -sp, cp], -1)], -2)
+    heading_matrix = np.stack([np.stack([ch, sh, zero], -1), np.stack([-sh, ch, zero], -1), np.stack([zero, zero, one], -1)], -2)
+
+    return heading_matrix @ pitch_matrix @ roll_matrix
+
+
+def _pixels_to_ray_components(camera, x, y):
+    '''
+    Input:  camera - CameraModel, or any object with res_x, res_y, res_diagonal and fov attributes (scalars or arrays),
+                     and distortion with undistort_pixels if the lens is not ideal
+            x, y - pixel coordinates
+    Output: u, v, w - components of the unit rays in the camera frame
+    '''
+    if getattr(camera, "distortion", None) is not None:
+        x, y = camera.undistort_pixels(x, y)
+    u = np.asarray(x, dtype=np.float64) - camera.res_x / 2
+    v = camera.res_y / 2 - np.asarray(y, dtype=np.float64)
+    radians_per_pixel = camera.fov / camera.res_diagonal
+
+    radius = np.hypot(u, v)
+    phi = radius * radians_per_pixel
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.where(radius > 0, np.sin(phi) / radius, radians_per_pixel)
+    return u * scale, v * scale, np.cos(phi)
+
+
+def _pixels_to_rays(camera, x, y):
+    '''
+    Input:  camera - as for _pixels_to_ray_components
+            x, y - pixel coordinates
+    Output: array (..., 3) of unit rays in the camera frame
+    '''
+    return np.stack(np.broadcast_arrays(*_pixels_to_ray_components(camera, x, y)), axis=-1)
+
+
+def _ray_components_to_pixels(camera, u, v, w):
+    '''
+    Input:  camera - as for _pixels_to_ray_components
+            u, v, w - components of rays in the camera frame, not necessarily unit length
+    Output: x, y - arrays of fractional pixel coordinates, NaN for rays behind the camera
+    '''
+    transverse = np.hypot(u, v)
+    phi = np.arctan2(transverse, w)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.where(transverse > 0, phi * camera.res_diagonal / camera.fov / transverse, 0.0)
+    scale = np.where(w > 0, scale, np.nan)
+
+    x, y = u * scale + camera.res_x / 2, camera.res_y / 2 - v * scale
+    if getattr(camera, "distortion", None) is not None:
+        x, y = camera.distort_pixels(x, y)
+    return x, y
+
+
+def _rays_to_pixels(camera, rays):
+    '''
+    Input:  camera - as for _pixels_to_ray_components
+            rays - array (..., 3) of rays in the camera frame
+    Output: x, y - arrays of fractional pixel coordinates, NaN for rays behind the camera
+    '''
+    return _ray_components_to_pixels(camera, rays[..., 0], rays[..., 1], rays[..., 2])
+
+
+def _camera_to_world(rotation, u, v, w):
+    '''
+    Input:  rotation - rotation matrix (3, 3), or stack of matrices broadcastable against the components
+            u, v, w - components of vectors in the camera frame
+    Output: east, north, down - components of the vectors in the world frame
+    '''
+    r = rotation
+    return (r[..., 0, 0] * u + r[..., 0, 1] * v + r[..., 0, 2] * w,
+            r[..., 1, 0] * u + r[..., 1, 1] * v + r[..., 1, 2] * w,
+            r[..., 2, 0] * u + r[..., 2, 1] * v + r[..., 2, 2] * w)
+
+
+def _world_to_camera(rotation, east, north, down):
+    '''
+    Input:  rotation - as for _camera_to_world
+            east, north, down - components of vectors in the world frame
+    Output: u, v, w - components of the vectors in the camera frame
+    '''
+    r = rotation
+    return (r[..., 0, 0] * east + r[..., 1, 0] * north + r[..., 2, 0] * down,
+            r[..., 0, 1] * east + r[..., 1, 1] * north + r[..., 2, 1] * down,
+            r[..., 0, 2] * east + r[..., 1, 2] * north + r[..., 2, 2] * down)
+
+
+def _truncate_pixels(x, y):
+    '''
+    Truncate fractional pixel coordinates like int(), mapping NaN to -1.
+    '''
+    invalid = np.isnan(x) | np.isnan(y)
+    x = np.where(invalid, -1, np.trunc(np.where(invalid, 0, x))).astype(np.int64)
+    y = np.where(invalid, -1, np.trunc(np.where(invalid, 0, y))).astype(np.int64)
+    return x, y
+
+
+def _pixels_to_geo(camera, pose, x, y):
+    '''
+    Project pixels to the ground, rotating every ray with the cached rotation matrix of the pose.
+    Input:  camera - CameraModel, or an object holding intrinsics as arrays (one per point)
+            pose - Pose, or an object holding lat, lon, alt, rotation and meters_per_degree_lon as arrays (one per point)
+            x, y - pixel coordinates
+    Output: lat, lon - arrays of ground coordinates in degrees, NaN where the pixel sees the sky
+    '''
+    east, north, down = _camera_to_world(pose.rotation, *_pixels_to_ray_components(camera, x, y))
+
+    # intersect the rays with the ground
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scale = np.where(down > 0, pose.alt / down, np.nan)
+    return _enu_to_geo(pose, east * scale, north * scale)
+
+
+def _geo_to_pixels(camera, pose, target_lat, target_lon):
+    '''
+    Project ground coordinates into the image. Arguments broadcast together as for _pixels_to_geo.
+    Input:  camera, pose - as for _pixels_to_geo
+            target_lat, target_lon - ground coordinates in degrees
+    Output: x, y - arrays of fractional pixel coordinates, NaN behind the camera
+    '''
+    east, north = _geo_to_enu(pose, target_lat, target_lon)
+
+    # direction from the sensor to the target in the world frame (East, North, Down)
+    u, v, w = _world_to_camera(pose.rotation, east, north, pose.alt)
+
+    return _ray_components_to_pixels(camera, u, v, w)
+
+
+def _enu_to_geo(pose, east, north):
+    '''
+    Convert ground offsets from the sensor to coordinates on the local tangent plane of the pose.
+    Input:  pose - as for _pixels_to_geo
+            east, north - offsets in meters
+    Output: lat, lon - arrays of coordinates in degrees
+
+    The tangent plane differs from the great circle path by less than d^2 / R * (0.5 + tan|lat|)
+    meters at a distance d, about 1.3 cm at ENU_MAX_RANGE and 38 degrees latitude. Points farther
+    than ENU_MAX_RANGE fall back to the exact spherical offset.
+
+    >>> pose = Pose(38.3155, -76.5509, 20, 0, 0, 0)
+    >>> rng = np.random.default_rng(0)
+    >>> distance = rng.uniform(0, 2 * ENU_MAX_RANGE, 10000)
+    >>> bearing = rng.uniform(-math.pi, math.pi, 10000)
+    >>> lat, lon = _enu_to_geo(pose, distance * np.sin(bearing), distance * np.cos(bearing))
+    >>> exact_lat, exact_lon = _offset_coordinates(pose.lat, pose.lon, distance, bearing)
+    >>> error = np.hypot((lat - exact_lat) * METERS_PER_DEGREE, (lon - exact_lon) * pose.meters_per_degree_lon)
+    >>> bound = np.minimum(distance, ENU_MAX_RANGE) ** 2 / EARTH_RADIUS * (0.5 + math.tan(math.radians(pose.lat)))
+    >>> bool(np.all(error <= bound + 1e-9)), bool(np.all(error[distance > ENU_MAX_RANGE] < 1e-6))
+    (True, True)
+    '''
+    east = np.asarray(east, dtype=np.float64)
+    north = np.asarray(north, dtype=np.float64)
+    lat = pose.lat + north / METERS_PER_DEGREE
+    lon = pose.lon + east / pose.meters_per_degree_lon
+
+    distance = np.hypot(east, north)
+    far = distance > ENU_MAX_RANGE
+    if np.any(far):
+        exact_lat, exact_lon = _offset_coordinates(pose.lat, pose.lon, distance, np.arctan2(east, north))
+        lat = np.where(far, exact_lat, lat)
+        lon = np.where(far, exact_lon, lon)
+
+    return lat, (lon + 540) % 360 - 180
+
+
+def _geo_to_enu(pose, lat, lon):
+    '''
+    Convert coordinates to ground offsets from the sensor on the local tangent plane of the pose.
+    Input:  pose - as for _pixels_to_geo
+            lat, lon - coordinates in degrees
+    Output: east, north - arrays of offsets in meters
+
+    Inverse of _enu_to_geo, with the same error bound and fallback to the exact spherical path.
+    '''
+    north = (np.asarray(lat, dtype=np.float64) - pose.lat) * METERS_PER_DEGREE
+    east = ((np.asarray(lon, dtype=np.float64) - pose.lon + 540) % 360 - 180) * pose.meters_per_degree_lon
+
+    far = np.hypot(east, north) > ENU_MAX_RANGE
+    if np.any(far):
+        distance, bearing = _distance_bearing(pose.lat, pose.lon, lat, lon)
+        east = np.where(far, distance * np.sin(bearing), east)
+        north = np.where(far, distance * np.cos(bearing), north)
+
+    return east, north
+
+
+def _offset_coordinates(lat, lon, distance, bearing):
+    '''
+    Offset coordinates along great circles on a spherical earth.
+    Input:  lat, lon - origins in degrees
+            distance - array of distances in meters
+            bearing - array of bearings in radians clockwise from North
+    Output: lat, lon - arrays of destination coordinates in degrees
+    '''
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lon)
+    angular = np.asarray(distance, dtype=np.float64) / EARTH_RADIUS
+
+    sin_lat1, cos_lat1 = np.sin(lat1), np.cos(lat1)
+    sin_d, cos_d = np.sin(angular), np.cos(angular)
+
+    sin_lat2 = sin_lat1 * cos_d + cos_lat1 * sin_d * np.cos(bearing)
+    lat2 = np.arcsin(np.clip(sin_lat2, -1.0, 1.0))
+    lon2 = lon1 + np.arctan2(np.sin(bearing) * sin_d * cos_lat1, cos_d - sin_lat1 * sin_lat2)
+
+    return np.degrees(lat2), (np.degrees(lon2) + 540) % 360 - 180
+
+
+def _distance_bearing(lat, lon, target_lat, target_lon):
+    '''
+    Great circle distance and initial bearing from coordinates to targets on a spherical earth.
+    Input:  lat, lon - origins in degrees
+            target_lat, target_lon - arrays of target coordinates in degrees
+    Output: distance - array of distances in meters
+            bearing - array of bearings in radians clockwise from North
+    '''
+    lat1 = np.radians(lat)
+    lat2 = np.radians(target_lat)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(target_lon) - lon)
+
+    cos_lat1, cos_lat2 = np.cos(lat1), np.cos(lat2)
+    a = np.sin(dlat / 2) ** 2 + cos_lat1 * cos_lat2 * np.sin(dlon / 2) ** 2
+    distance = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    bearing = np.arctan2(np.sin(dlon) * cos_lat2,
+                         cos_lat1 * np.sin(lat2) - np.sin(lat1) * cos_lat2 * np.cos(dlon))
+
+    return distance, bearing
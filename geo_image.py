@@ -7,134 +7,381 @@ Description: This module provides spatial data for UAS images, and enables conve
 Version: v1.0.0
 '''
 
+import copy
+import itertools
 import math
-import sys
-import cv2
-sys.path.append("../")
-from MAVez.Coordinate import Coordinate
+import os
+import numpy as np
+from geo_core import (Coordinate, CameraModel, Pose, _camera_to_world, _enu_to_geo, _geo_to_enu, _geo_to_pixels,
+                      _pixels_to_geo, _pixels_to_ray_components, _truncate_pixels)
+from image_cache import IMAGE_CACHE
+from metrics import instrument
+
+# identifies a frame and one of its poses in query cache keys, never reused within the process
+_POSE_KEYS = itertools.count()
 
 
 class GeoImage:
-    def __init__(self, image, coordinate, roll, pitch, heading, res_x, res_y, sensor_width, sensor_height, fov, index=-1, logger=None):
+    def __init__(self, image, coordinate, roll, pitch, heading, res_x=None, res_y=None, sensor_width=None, sensor_height=None,
+                 fov=None, index=-1, logger=None, camera=None, query_cache=None):
         '''
-        image: cv2 image object
-        latitude: latitude of the sensor in degrees
-        longitude: longitude of the sensor in degrees
-        altitude: altitude of the sensor in meters
+        image: cv2 image object, path to an image file, callable returning a cv2 image, or None for geometry only.
+               Paths and callables are decoded on first access to .image, through the shared image cache.
+        coordinate: Coordinate of the sensor, with latitude and longitude in degrees and altitude above ground in meters
         roll: roll of the sensor in degrees
         pitch: pitch of the sensor in degrees
         heading: heading of the sensor in degrees
         res_x: resolution of the sensor in the x direction (pixels)
         res_y: resolution of the sensor in the y direction (pixels)
-        focal_length: focal length of the sensor in mm
         sensor_width: width of the sensor in mm
         sensor_height: height of the sensor in mm
+        fov: diagonal field of view of the sensor in degrees or radians
         index: index of the image in the list of images
         logger: logger object for logging
+        camera: CameraModel to use instead of res_x, res_y, sensor_width, sensor_height and fov.
+                Frames given the same intrinsics share one CameraModel either way, and assigning
+                one of the intrinsics later swaps in the shared CameraModel with the new value.
+        query_cache: QueryCache memoizing get_coordinates and get_pixels, usually the shared QUERY_CACHE,
+                     None to compute every query
         '''
 
-        self.image = image
-        self.coordinate = coordinate
-        self.roll = math.radians((-roll)%360) # Convert from degrees to radians
-        self.heading = math.radians((heading)%360) # Convert from degrees to radians
-        self.pitch = math.radians((pitch)%360) # Convert from degrees to radians
-        self.res_x = res_x
-        self.res_y = res_y
-        self.res_diagonal = (res_x ** 2 + res_y ** 2) ** 0.5
-        self.sensor_width = sensor_width
-        self.sensor_height = sensor_height
-        self.sensor_diagonal = math.sqrt(self.sensor_width ** 2 + self.sensor_height ** 2)
-        self.shape = self.image.shape
+        self._image = None
+        self._source = None
+        if isinstance(image, (str, os.PathLike)) or callable(image):
+            self._source = image
+        else:
+            self._image = image
+        # lazily loaded images take their shape from the camera rather than being decoded to read it
+        self.shape = self._image.shape if self._image is not None else None
+        self.camera = camera if camera is not None else CameraModel.shared(res_x, res_y, sensor_width, sensor_height, fov)
+        self.query_cache = query_cache
+        self.set_pose(coordinate, roll, pitch, heading)
         self.logger = logger
         self.index = index
 
-        # convert fov to radians
-        if fov > math.pi*2: # if fov is in degrees
-            self.fov = math.radians(fov)
-            if self.logger:
-                self.logger.info(f"Converted fov from degrees to radians: {self.fov}")
-        else:
-            self.fov = fov
-        
         if self.logger:
-            self.logger.info(f"Initialized GeoImage: {self.index}, {self.coordinate}")
+            self.logger.info("Initialized GeoImage: %s, %s", self.index, self.coordinate)
+
+
+    roll = property(lambda self: self.pose.roll)
+    pitch = property(lambda self: self.pose.pitch)
+    heading = property(lambda self: self.pose.heading)
+    res_x = property(lambda self: self.camera.res_x, lambda self, value: self._replace_camera(res_x=value))
+    res_y = property(lambda self: self.camera.res_y, lambda self, value: self._replace_camera(res_y=value))
+    res_diagonal = property(lambda self: self.camera.res_diagonal)
+    sensor_width = property(lambda self: self.camera.sensor_width, lambda self, value: self._replace_camera(sensor_width=value))
+    sensor_height = property(lambda self: self.camera.sensor_height, lambda self, value: self._replace_camera(sensor_height=value))
+    sensor_diagonal = property(lambda self: self.camera.sensor_diagonal)
+    fov = property(lambda self: self.camera.fov, lambda self, value: self._replace_camera(fov=value))
 
 
+    @property
+    def camera(self):
+        '''
+        Shared CameraModel holding the intrinsics of the frame.
+        Replacing it, directly or by assigning one of the intrinsics, drops the cached query results.
+
+        >>> from geo_core import Coordinate
+        >>> image = GeoImage(None, Coordinate(38.3155, -76.5509, 20, use_int=False), 0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3)
+        >>> wide = image.get_coordinates(4056, 1520).lon
+        >>> image.fov = 60
+        >>> image.camera is CameraModel.shared(4056, 3040, 6.29, 4.71, 60), image.get_coordinates(4056, 1520).lon < wide
+        (True, True)
+        >>> image.res_x, image.res_y = 2028, 1520
+        >>> image.shape, image.camera.key == CameraModel.shared(2028, 1520, 6.29, 4.71, 60).key
+        ((1520, 2028, 3), True)
+        '''
+        return self._camera
+
+
+    @camera.setter
+    def camera(self, camera):
+        self._camera = camera
+        self._pose_key = next(_POSE_KEYS)
+        if self._image is None:
+            self.shape = (camera.res_y, camera.res_x, 3)
+
+
+    def _replace_camera(self, **intrinsics):
+        camera = self.camera
+        values = {name: getattr(camera, name) for name in ("res_x", "res_y", "sensor_width", "sensor_height", "fov", "distortion")}
+        values.update(intrinsics)
+        self.camera = CameraModel.shared(**values)
+
+
+    @property
+    def image(self):
+        '''
+        Pixels of the image, decoded on first access if the image was given as a path or loader.
+        '''
+        if self._image is not None or self._source is None:
+            return self._image
+        return IMAGE_CACHE.get(self._source, self._load)
+
+
+    @image.setter
+    def image(self, image):
+        self._image = image
+        self._source = None
+
+
+    def set_pose(self, coordinate, roll, pitch, heading):
+        '''
+        Replace the position and attitude of the frame, for example after a telemetry correction.
+        Input:  coordinate - Coordinate of the sensor, altitude above ground in meters
+                roll, pitch, heading - attitude of the sensor in degrees
+
+        Cached query results of the previous pose are no longer returned, and age out of the cache.
+        Corrections must go through set_pose rather than by editing coordinate for the cache to see them.
+        '''
+        self.coordinate = coordinate
+        self.pose = Pose.from_degrees(coordinate, roll, pitch, heading)
+        self._pose_key = next(_POSE_KEYS)
+
+
+    def without_pixels(self):
+        '''
+        Output: a copy of the GeoImage without image pixels or logger, cheap to pickle to worker processes
+        '''
+        clone = copy.copy(self)
+        clone._image = None
+        clone._source = None
+        clone.logger = None
+        return clone
+
+
+    def _load(self):
+        if callable(self._source):
+            return self._source()
+        import cv2 # loaded on the first decode
+        image = cv2.imread(os.fspath(self._source))
+        if image is None:
+            raise FileNotFoundError(f"Could not read image {self._source}")
+        return image
+
+
+    @instrument("GeoImage.get_coordinates")
     def get_coordinates(self, x, y):
         '''
         Convert pixel coordinates to geographical coordinates.
         Input:  x, y - pixel coordinates
-        Output: Coordinate object with latitude, longitude, and altitude for the pixel
-        '''
+        Output: Coordinate object with latitude, longitude, and altitude for the pixel, None if the pixel sees the sky
 
-        # center the coordinates to convert to polar coordinates
-        x = x - self.res_x / 2 # pixels
-        y = self.res_y / 2 - y # pixels
+        With a query cache the pixel is snapped to the cache's pixel grid, and repeated queries
+        of the same cell are answered from the cache.
 
-        # convert pixel coordinates to meters
-        x = x * (self.sensor_diagonal / self.res_diagonal) # meters
-        y = y * (self.sensor_diagonal / self.res_diagonal)
+        >>> from query_cache import QueryCache
+        >>> cache = QueryCache()
+        >>> image = GeoImage(None, Coordinate(38.3155, -76.5509, 20, use_int=False), 2, -1, 30,
+        ...                  4056, 3040, 6.29, 4.71, 78.3, query_cache=cache)
+        >>> first = image.get_coordinates(1000, 500)
+        >>> str(image.get_coordinates(1000.2, 499.9)) == str(first), (cache.hits, cache.misses)
+        (True, (1, 1))
 
-        # radius is the distance from the center of the image to the pixel
-        radius = math.sqrt(x ** 2 + y ** 2) # meters
-        print(radius)
-        # theta is the angle from the x-axis to the pixel (counter-clockwise)
-        theta = math.atan2(x, y) # radians
+        Correcting the pose moves the answers with it.
 
-        # phi is the angle from the z-axis to the pixel (direction of the camera)
-        phi = radius / (self.sensor_diagonal) * self.fov # radians, assuming linear projection/pinhole camera model
-        # factor in vehicle attitude
-        point_bearing = theta + self.heading # radians
-        point_pitch = phi + self.pitch # radians
+        >>> image.set_pose(Coordinate(38.3155, -76.5509, 25, use_int=False), 2, -1, 30)
+        >>> str(image.get_coordinates(1000, 500)) == str(first), (cache.hits, cache.misses)
+        (False, (1, 2))
+        '''
+        cache = self.query_cache
+        if cache is None:
+            return self._get_coordinates(x, y)
+        key, x, y = cache.quantize(x, y, cache.pixel_step)
+        target_coordinate = cache.get((self._pose_key, "coordinates", key), lambda: self._get_coordinates(x, y))
+        if target_coordinate is None:
+            return None
+        # the cached Coordinate stays private to the cache
+        return Coordinate(target_coordinate.lat, target_coordinate.lon, target_coordinate.alt, use_int=False)
+
+
+    def _get_coordinates(self, x, y):
+        camera = self.camera
+        if camera.distortion is not None:
+            x, y = (float(value) for value in camera.undistort_pixels(x, y))
+
+        # center the coordinates, the radius from the center is proportional to the angle off the optical axis
+        u = x - camera.res_x / 2 # pixels
+        v = camera.res_y / 2 - y # pixels
+        radius = math.hypot(u, v)
+        phi = radius * camera.fov / camera.res_diagonal # radians
+        scale = math.sin(phi) / radius if radius else camera.fov / camera.res_diagonal
+        ray = (u * scale, v * scale, math.cos(phi))
+
+        # rotate the ray into the world frame (East, North, Down) and intersect it with the ground
+        east, north, down = (r[0] * ray[0] + r[1] * ray[1] + r[2] * ray[2] for r in self.pose.rows)
+        if down <= 0:
+            return None
+        scale = self.coordinate.alt / down # meters per unit of ray
+
+        # calculate the latitude and longitude of the point on the tangent plane of the pose, as the batch path does
+        lat, lon = _enu_to_geo(self.pose, east * scale, north * scale)
+        target_coordinate = Coordinate(float(lat), float(lon), self.coordinate.alt, use_int=False)
 
-        # calculate the distance to the point
-        distance = (self.coordinate.alt * 1000) * math.tan(point_pitch) # convert altitude to mm
+        if self.logger:
+            self.logger.info("Converted pixel coordinates (%s, %s) to geographical coordinates (%s, %s)",
+                             x, y, target_coordinate.lat, target_coordinate.lon)
 
-        # calculate the latitude and longitude of the point
-        target_coordinate = self.coordinate.offset_coordinate(distance / 1000, math.degrees(point_bearing)) # convert distance to meters
+        return target_coordinate
+
+
+    @instrument("GeoImage.get_coordinates_batch", points="x")
+    def get_coordinates_batch(self, x, y):
+        '''
+        Convert arrays of pixel coordinates to geographical coordinates.
+        Input:  x, y - array-likes of pixel coordinates (broadcastable against each other)
+        Output: lat, lon, alt - arrays of latitude and longitude in degrees and altitude in meters,
+                NaN where the pixel sees the sky
+
+        Vectorized counterpart of get_coordinates. The offset is applied on a spherical earth of
+        EARTH_RADIUS, and agrees with the scalar path to within 1e-6 degrees (about 0.1 m) for
+        points inside the camera's field of view.
+
+        >>> image = GeoImage(None, Coordinate(38.3155, -76.5509, 20, use_int=False),
+        ...                  roll=3, pitch=5, heading=45, res_x=4056, res_y=3040, sensor_width=6.29, sensor_height=4.71, fov=78.3)
+        >>> xs, ys = np.meshgrid(np.arange(0, 4057, 507), np.arange(0, 3041, 380))
+        >>> lat, lon, alt = image.get_coordinates_batch(xs, ys)
+        >>> lat.shape
+        (9, 9)
+        >>> expected = [image.get_coordinates(int(x), int(y)) for x, y in zip(xs.ravel(), ys.ravel())]
+        >>> bool(np.allclose(lat.ravel(), [c.lat for c in expected], rtol=0, atol=1e-6))
+        True
+        >>> bool(np.allclose(lon.ravel(), [c.lon for c in expected], rtol=0, atol=1e-6))
+        True
+
+        Roll tilts the view sideways, rolling right moves the center of the image to the left:
+
+        >>> rolled = GeoImage(None, Coordinate(38.3155, -76.5509, 20, use_int=False),
+        ...                   roll=10, pitch=0, heading=0, res_x=4056, res_y=3040, sensor_width=6.29, sensor_height=4.71, fov=78.3)
+        >>> lat, lon, _ = rolled.get_coordinates_batch(2028, 1520)
+        >>> round(float(lon - -76.5509) * 6371000 * math.pi / 180 * math.cos(math.radians(38.3155)), 2)
+        -3.53
+        '''
+        lat, lon = _pixels_to_geo(self.camera, self.pose, x, y)
+        alt = np.where(np.isnan(lat), np.nan, self.coordinate.alt)
 
         if self.logger:
-            self.logger.info(f"Converted pixel coordinates ({x}, {y}) to geographical coordinates ({target_coordinate.lat}, {target_coordinate.lon})")
+            self.logger.info("Converted %s pixel coordinates to geographical coordinates", lat.size)
+
+        return lat, lon, alt
+
+
+    def get_rays_batch(self, x, y):
+        '''
+        Input:  x, y - array-likes of pixel coordinates (broadcastable against each other)
+        Output: east, north, down - arrays of the components of the unit viewing rays in the world frame
+        '''
+        return _camera_to_world(self.pose.rotation, *_pixels_to_ray_components(self.camera, x, y))
 
-        return target_coordinate
 
+    def footprint(self, samples_per_edge=4):
+        '''
+        Compute the ground footprint polygon of the image.
+        Input:  samples_per_edge - number of points sampled along each image edge
+        Output: lat, lon - arrays of polygon vertices in degrees, clockwise from the top left corner
+
+        The image edges are not straight lines on the ground, so each edge is sampled
+        rather than using the four corners alone.
+        '''
+        steps = np.linspace(0, 1, samples_per_edge, endpoint=False)
+        x = np.concatenate([steps * self.res_x, np.full_like(steps, self.res_x),
+                            (1 - steps) * self.res_x, np.zeros_like(steps)])
+        y = np.concatenate([np.zeros_like(steps), steps * self.res_y,
+                            np.full_like(steps, self.res_y), (1 - steps) * self.res_y])
+        lat, lon, _ = self.get_coordinates_batch(x, y)
+        return lat, lon
 
+
+    @instrument("GeoImage.get_pixels")
     def get_pixels(self, target_coordinate):
         '''
         Convert geographical coordinates to pixel coordinates.
-        Input:  latitude, longitude - coordinates in degrees
-        Output: x, y - pixel coordinates
+        Input:  target_coordinate - Coordinate object
+        Output: x, y - pixel coordinates, (-1, -1) if the coordinate is behind the camera
+
+        With a query cache the coordinate is snapped to the cache's degree grid, and repeated
+        queries of the same cell are answered from the cache.
         '''
-        
-        # get the distance and bearing to the target coordinate
-        distance = self.coordinate.distance_to(target_coordinate) * 1000 # convert distance to mm
-        bearing = self.coordinate.bearing_to(target_coordinate)
-        bearing = math.radians(bearing)
-
-        # calculate the angle from the z-axis to the target coordinate, accounting for the pitch of the camera
-        phi = math.atan2(distance, self.coordinate.alt * 1000) - self.pitch # radians, convert altitude to mm
-        # align the bearing with the camera heading
-        theta = bearing - self.heading # radians
-        # calculate the radius of the pixel
-        radius = phi * (self.sensor_diagonal) / self.fov # meters
+        cache = self.query_cache
+        if cache is None:
+            return self._get_pixels(target_coordinate)
+        key, lat, lon = cache.quantize(target_coordinate.lat, target_coordinate.lon, cache.degree_step)
+        return cache.get((self._pose_key, "pixels", key),
+                         lambda: self._get_pixels(Coordinate(lat, lon, target_coordinate.alt, use_int=False)))
+
+
+    def _get_pixels(self, target_coordinate):
+        camera = self.camera
+
+        # get the ground offset to the target coordinate on the tangent plane of the pose, as the batch path does
+        east, north = _geo_to_enu(self.pose, target_coordinate.lat, target_coordinate.lon) # meters
+
+        # rotate the direction to the target (East, North, Down) into the camera frame
+        world = (float(east), float(north), self.coordinate.alt)
+        rows = self.pose.rows
+        u, v, w = (rows[0][i] * world[0] + rows[1][i] * world[1] + rows[2][i] * world[2] for i in range(3))
+        if w <= 0:
+            return -1, -1
+
+        # the radius from the center of the image is proportional to the angle off the optical axis
+        phi = math.atan2(math.hypot(u, v), w)
+        scale = phi * camera.res_diagonal / camera.fov / math.hypot(u, v) if u or v else 0
         if self.logger:
-            self.logger.info(f"Calculated radius: {radius}")
-        # calculate the pixel distance from the center of the image
-        x = radius * math.sin(theta)
-        y = radius * math.cos(theta)
-        # convert distance to pixels
-        x = x * (self.res_diagonal / self.sensor_diagonal)
-        y = y * (self.res_diagonal / self.sensor_diagonal)
+            self.logger.info("Calculated angle off axis: %s", phi)
+
         # reset origin to top left corner of the image
-        x = int(x + self.res_x / 2)
-        y = int(self.res_y / 2 - y)
+        x = u * scale + camera.res_x / 2
+        y = camera.res_y / 2 - v * scale
+        if camera.distortion is not None:
+            x, y = (float(value) for value in camera.distort_pixels(x, y))
+        x, y = int(x), int(y)
 
         if self.logger:
-            self.logger.info(f"Converted geographical coordinates ({target_coordinate.lat}, {target_coordinate.lon}) to pixel coordinates ({x}, {y})")
+            self.logger.info("Converted geographical coordinates (%s, %s) to pixel coordinates (%s, %s)",
+                             target_coordinate.lat, target_coordinate.lon, x, y)
 
         return x, y
 
 
+    @instrument("GeoImage.get_pixels_batch", points="lat")
+    def get_pixels_batch(self, lat, lon):
+        '''
+        Convert arrays of geographical coordinates to pixel coordinates.
+        Input:  lat, lon - array-likes of coordinates in degrees (broadcastable against each other)
+        Output: x, y - integer arrays of pixel coordinates, -1 where the coordinate is behind the camera
+
+        Vectorized counterpart of get_pixels, using the same spherical earth as get_coordinates_batch.
+
+        >>> image = GeoImage(None, Coordinate(38.3155, -76.5509, 20, use_int=False),
+        ...                  roll=-4, pitch=-2, heading=30, res_x=4056, res_y=3040, sensor_width=6.29, sensor_height=4.71, fov=78.3)
+        >>> lat, lon, _ = image.get_coordinates_batch([100.5, 2028.5, 4000.5], [50.5, 1520.5, 3000.5])
+        >>> x, y = image.get_pixels_batch(lat, lon)
+        >>> x.tolist(), y.tolist()
+        ([100, 2028, 4000], [50, 1520, 3000])
+        >>> expected = np.array([image.get_pixels(Coordinate(a, b, 0, use_int=False)) for a, b in zip(lat, lon)])
+        >>> int(np.abs(expected - np.stack([x, y], axis=1)).max()) <= 1
+        True
+        '''
+        x, y = _geo_to_pixels(self.camera, self.pose, lat, lon)
+        x, y = _truncate_pixels(x, y)
+
+        if self.logger:
+            self.logger.info("Converted %s geographical coordinates to pixel coordinates", x.size)
+
+        return x, y
+
+
+    def contains_batch(self, lat, lon):
+        '''
+        Check which of the given coordinates are within the image bounds.
+        Input:  lat, lon - array-likes of coordinates in degrees
+        Output: boolean array, True where the coordinate falls inside the image
+        '''
+        x, y = self.get_pixels_batch(lat, lon)
+        return (0 <= x) & (x < self.res_x) & (0 <= y) & (y < self.res_y)
+
+
+    @instrument("GeoImage.__contains__")
     def __contains__(self, coordinate):
         '''
         Check if the given coordinate is within the image bounds.
@@ -145,15 +392,44 @@ class GeoImage:
         if 0 <= x_pixel < self.res_x and 0 <= y_pixel < self.res_y:
             # logging
             if self.logger:
-                self.logger.info(f"Coordinate {coordinate} is within image {self.index}.")
+                self.logger.info("Coordinate %s is within image %s.", coordinate, self.index)
             return True
         else:
             # logging
             if self.logger:
-                self.logger.info(f"Coordinate {coordinate} is outside image {self.index}.")
+                self.logger.info("Coordinate %s is outside image %s.", coordinate, self.index)
             return False
 
+
+@instrument("containment_matrix", points=lambda arguments: len(arguments["images"]) * np.size(arguments["lat"]))
+def containment_matrix(images, lat, lon):
+    '''
+    Check which images contain which coordinates.
+    Input:  images - sequence of GeoImage objects
+            lat, lon - 1-D array-likes of target coordinates in degrees
+    Output: boolean array of shape (len(images), len(lat)), True where image i contains target j
+
+    >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+    >>> images = [GeoImage(None, coordinate.offset_coordinate(10 * i, 90),
+    ...                    0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3, index=i) for i in range(3)]
+    >>> targets = [coordinate.offset_coordinate(d, 90) for d in (0, 15, 100)]
+    >>> containment_matrix(images, [t.lat for t in targets], [t.lon for t in targets]).astype(int)
+    array([[1, 0, 0],
+           [1, 1, 0],
+           [0, 1, 0]])
+    '''
+    lat = np.asarray(lat, dtype=np.float64).ravel()
+    lon = np.asarray(lon, dtype=np.float64).ravel()
+
+    matrix = np.zeros((len(images), lat.size), dtype=bool)
+    for row, image in enumerate(images):
+        matrix[row] = image.contains_batch(lat, lon)
+
+    return matrix
+
+
 def main2():
+    import cv2
     image = GeoImage(
         image=cv2.imread("test_images/0000.png"),
         coordinate=Coordinate(-34, 76, 20, use_int=False),
@@ -243,6 +519,7 @@ def main2():
     
 
 def main():
+    import cv2
     image = GeoImage(
         image=cv2.imread("test_images/0000.png"),
         coordinate=Coordinate(-34, 76, 20, use_int=False),
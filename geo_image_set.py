@@ -0,0 +1,354 @@
+'''
+geo_image_set.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides a compact structure-of-arrays collection of GeoImage metadata with vectorized set-wide operations.
+Version: v1.0.0
+'''
+
+from types import SimpleNamespace
+import numpy as np
+from geo_core import (METERS_PER_DEGREE, Coordinate, Pose, _camera_to_world, _pixels_to_geo, _pixels_to_ray_components,
+                      _geo_to_pixels, _truncate_pixels)
+from geo_image import GeoImage
+
+POSE_COLUMNS = ("lat", "lon", "alt", "roll", "pitch", "heading") # roll, pitch and heading in radians as stored by GeoImage
+
+
+class GeoImageSet:
+    def __init__(self, capacity=64):
+        '''
+        capacity: initial number of frames allocated, the columns grow as frames are added
+
+        Holds the pose, cached rotation matrix, intrinsics index and footprint bounds of every frame
+        in contiguous numpy columns. Frames sharing a CameraModel share one entry in .cameras.
+        '''
+        self.columns = {name: np.zeros(capacity, dtype=np.float64) for name in POSE_COLUMNS}
+        self.columns["camera"] = np.zeros(capacity, dtype=np.int32)
+        self.columns["index"] = np.zeros(capacity, dtype=np.int64)
+        self.rotations = np.zeros((capacity, 3, 3))
+        self.bounds = np.full((capacity, 4), np.nan) # lat_min, lat_max, lon_min, lon_max
+        self.cameras = [] # CameraModel objects
+        self.sources = [] # image path or loader per frame, None for geometry only
+        self._camera_lookup = {}
+        self._camera_table = None
+        self._size = 0
+
+
+    @classmethod
+    def from_images(cls, images):
+        '''
+        Input:  images - iterable of GeoImage objects
+        Output: GeoImageSet holding their metadata
+        '''
+        images = list(images)
+        image_set = cls(max(len(images), 1))
+        for image in images:
+            image_set.append(image)
+        return image_set
+
+
+    @classmethod
+    def from_columns(cls, columns, rotations, bounds, cameras, sources):
+        '''
+        Wrap existing arrays without copying them, for example memory-mapped session columns.
+        Input:  columns - dict of the POSE_COLUMNS, "camera" and "index" arrays
+                rotations - array of shape (n, 3, 3)
+                bounds - array of shape (n, 4)
+                cameras - list of CameraModel objects indexed by the "camera" column
+                sources - list of image sources, one per frame
+        Output: GeoImageSet over the arrays, which are copied only if frames are appended
+        '''
+        image_set = cls(0)
+        image_set.columns = dict(columns)
+        image_set.rotations = rotations
+        image_set.bounds = bounds
+        image_set.cameras = list(cameras)
+        image_set.sources = list(sources)
+        image_set._camera_lookup = {camera.key: i for i, camera in enumerate(image_set.cameras)}
+        image_set._size = len(bounds)
+        return image_set
+
+
+    def __len__(self):
+        return self._size
+
+
+    def __getitem__(self, row):
+        if not -self._size <= row < self._size:
+            raise IndexError("GeoImageSet index out of range")
+        return GeoImageView(self, row % self._size)
+
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield GeoImageView(self, row)
+
+
+    @property
+    def nbytes(self):
+        '''
+        Size of the columns in bytes, excluding the shared camera table and the image sources.
+        '''
+        return (sum(column[:self._size].nbytes for column in self.columns.values())
+                + self.rotations[:self._size].nbytes + self.bounds[:self._size].nbytes)
+
+
+    def column(self, name):
+        '''
+        Input:  name - column name
+        Output: view of the column for the frames in the set
+        '''
+        return self.columns[name][:self._size]
+
+
+    def _grow(self):
+        capacity = max(2 * len(self.bounds), 1)
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self.columns[name] = grown
+        bounds = np.full((capacity, 4), np.nan)
+        bounds[:self._size] = self.bounds[:self._size]
+        self.bounds = bounds
+        rotations = np.zeros((capacity, 3, 3))
+        rotations[:self._size] = self.rotations[:self._size]
+        self.rotations = rotations
+
+
+    def _camera(self, camera):
+        if camera.key not in self._camera_lookup:
+            self._camera_lookup[camera.key] = len(self.cameras)
+            self.cameras.append(camera)
+            self._camera_table = None
+        return self._camera_lookup[camera.key]
+
+
+    def append(self, image, footprint=True):
+        '''
+        Add a frame.
+        Input:  image - GeoImage object
+                footprint - compute and store the footprint bounds of the frame
+        Output: row of the frame in the set
+        '''
+        if self._size == len(self.bounds):
+            self._grow()
+        row = self._size
+
+        pose = image.pose
+        for name in POSE_COLUMNS:
+            self.columns[name][row] = getattr(pose, name)
+        self.rotations[row] = pose.rotation
+        self.columns["camera"][row] = self._camera(image.camera)
+        self.columns["index"][row] = image.index
+        self.sources.append(image._source)
+        if footprint:
+            lat, lon = image.footprint()
+            self.bounds[row] = (lat.min(), lat.max(), lon.min(), lon.max())
+
+        self._size += 1
+        return row
+
+
+    def footprints(self, samples_per_edge=4):
+        '''
+        Compute the footprint polygons of every frame in one vectorized projection.
+        Input:  samples_per_edge - number of points sampled along each image edge
+        Output: lat, lon - arrays of shape (frames, 4 * samples_per_edge), vertices ordered as GeoImage.footprint
+        '''
+        steps = np.linspace(0, 1, samples_per_edge, endpoint=False)
+        x = np.concatenate([steps, np.ones_like(steps), 1 - steps, np.zeros_like(steps)])
+        y = np.concatenate([np.zeros_like(steps), steps, np.ones_like(steps), 1 - steps])
+
+        rows = np.repeat(np.arange(self._size), x.size)
+        intrinsics = self._intrinsics(rows)
+        lat, lon, _ = self.get_coordinates(rows, np.tile(x, self._size) * intrinsics.res_x,
+                                           np.tile(y, self._size) * intrinsics.res_y)
+        return lat.reshape(self._size, x.size), lon.reshape(self._size, x.size)
+
+
+    def _intrinsics(self, rows):
+        '''
+        Input:  rows - array of frame rows
+        Output: camera intrinsics of each frame as arrays, for the projection functions
+        '''
+        if self._camera_table is None:
+            self._camera_table = np.array([(camera.res_x, camera.res_y, camera.res_diagonal, camera.fov)
+                                           for camera in self.cameras], dtype=np.float64)
+        cameras = self.columns["camera"][rows]
+        res_x, res_y, res_diagonal, fov = self._camera_table[cameras].T
+        intrinsics = SimpleNamespace(res_x=res_x, res_y=res_y, res_diagonal=res_diagonal, fov=fov, distortion=None)
+        if any(camera.distortion is not None for camera in self.cameras):
+            intrinsics.distortion = True
+            intrinsics.undistort_pixels = lambda x, y: self._per_camera(cameras, "undistort_pixels", x, y)
+            intrinsics.distort_pixels = lambda x, y: self._per_camera(cameras, "distort_pixels", x, y)
+        return intrinsics
+
+
+    def _per_camera(self, cameras, method, x, y):
+        '''
+        Apply a CameraModel pixel mapping to points from frames with different cameras.
+        Input:  cameras - array of camera indices, one per point
+                method - name of the CameraModel method
+                x, y - arrays of pixel coordinates
+        Output: x, y - arrays of mapped pixel coordinates
+        '''
+        cameras, x, y = np.broadcast_arrays(cameras, np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        mapped_x, mapped_y = x.copy(), y.copy()
+        for camera in np.unique(cameras):
+            points = cameras == camera
+            mapped_x[points], mapped_y[points] = getattr(self.cameras[camera], method)(x[points], y[points])
+        return mapped_x, mapped_y
+
+
+    def _poses(self, rows):
+        '''
+        Input:  rows - array of frame rows
+        Output: position and rotation of each frame as arrays, for the projection functions
+        '''
+        lat = self.columns["lat"][rows]
+        return SimpleNamespace(lat=lat, lon=self.columns["lon"][rows], alt=self.columns["alt"][rows],
+                               rotation=self.rotations[rows], meters_per_degree_lon=METERS_PER_DEGREE * np.cos(np.radians(lat)))
+
+
+    def get_coordinates(self, rows, x, y):
+        '''
+        Convert pixels from many frames to geographical coordinates in one vectorized call.
+        Input:  rows - array of frame rows, one per pixel
+                x, y - arrays of pixel coordinates
+        Output: lat, lon, alt - arrays of coordinates in degrees and meters
+        '''
+        rows = np.asarray(rows, dtype=np.int64)
+        lat, lon = _pixels_to_geo(self._intrinsics(rows), self._poses(rows), x, y)
+        return lat, lon, np.where(np.isnan(lat), np.nan, self.columns["alt"][rows])
+
+
+    def get_rays(self, rows, x, y):
+        '''
+        Input:  rows - array of frame rows, one per pixel
+                x, y - arrays of pixel coordinates
+        Output: east, north, down - arrays of the components of the unit viewing rays in the world frame
+        '''
+        rows = np.asarray(rows, dtype=np.int64)
+        return _camera_to_world(self.rotations[rows], *_pixels_to_ray_components(self._intrinsics(rows), x, y))
+
+
+    def get_pixels(self, rows, lat, lon):
+        '''
+        Convert geographical coordinates to pixels of many frames in one vectorized call.
+        Input:  rows - array of frame rows, one per coordinate (broadcastable against lat and lon)
+                lat, lon - arrays of coordinates in degrees
+        Output: x, y - integer arrays of pixel coordinates, -1 where the coordinate is behind the camera
+        '''
+        rows = np.asarray(rows, dtype=np.int64)
+        x, y = _geo_to_pixels(self._intrinsics(rows), self._poses(rows), lat, lon)
+        return _truncate_pixels(x, y)
+
+
+    def contains(self, lat, lon):
+        '''
+        Check which frames contain which coordinates.
+        Input:  lat, lon - 1-D array-likes of coordinates in degrees
+        Output: boolean array of shape (len(self), len(lat)), True where frame i contains coordinate j
+
+        Frames whose footprint bounds exclude a coordinate are skipped before the exact projection.
+        '''
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        bounds = self.bounds[:self._size]
+        candidate = ~(lat < bounds[:, :1]) & ~(lat > bounds[:, 1:2]) & ~(lon < bounds[:, 2:3]) & ~(lon > bounds[:, 3:4])
+
+        rows, points = np.nonzero(candidate)
+        x, y = self.get_pixels(rows, lat[points], lon[points])
+        intrinsics = self._intrinsics(rows)
+        inside = (0 <= x) & (x < intrinsics.res_x) & (0 <= y) & (y < intrinsics.res_y)
+
+        matrix = np.zeros(candidate.shape, dtype=bool)
+        matrix[rows[inside], points[inside]] = True
+        return matrix
+
+
+class GeoImageView(GeoImage):
+    '''
+    Row of a GeoImageSet, usable wherever a GeoImage is expected. Every attribute is read from the
+    set's columns, so views are cheap to create and hold no data of their own, and set_pose and
+    assignments to the camera or its intrinsics write back into the row.
+
+    >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+    >>> image = GeoImage(None, coordinate, 2, -1, 30, 4056, 3040, 6.29, 4.71, 78.3)
+    >>> view = GeoImageSet.from_images([image])[0]
+    >>> target, expected = view.get_coordinates(1000, 500), image.get_coordinates(1000, 500)
+    >>> (target.lat, target.lon) == (expected.lat, expected.lon)
+    True
+    >>> view.get_pixels(coordinate) == image.get_pixels(coordinate), coordinate in view
+    (True, True)
+
+    >>> corrected = coordinate.offset_coordinate(30, 90)
+    >>> view.set_pose(corrected, 2, -1, 30)
+    >>> image.set_pose(corrected, 2, -1, 30)
+    >>> view.coordinate.lon == corrected.lon, view.get_pixels(coordinate) == image.get_pixels(coordinate), coordinate in view
+    (True, True, False)
+
+    >>> view.fov = image.fov = 60
+    >>> view.camera is image.camera, view.get_pixels(coordinate) == image.get_pixels(coordinate)
+    (True, True)
+    '''
+    def __init__(self, image_set, row):
+        self._set = image_set
+        self._row = row
+
+    def _value(self, name):
+        return self._set.columns[name][self._row].item()
+
+    coordinate = property(lambda self: Coordinate(self._value("lat"), self._value("lon"), self._value("alt"), use_int=False))
+    pose = property(lambda self: Pose(*(self._value(name) for name in POSE_COLUMNS), rotation=self._set.rotations[self._row]))
+    index = property(lambda self: self._value("index"))
+    shape = property(lambda self: (self.res_y, self.res_x, 3))
+    logger = None
+    query_cache = None
+    _image = None
+    _source = property(lambda self: self._set.sources[self._row])
+    # the pose values are part of the key, so results cached before a correction are never returned
+    _pose_key = property(lambda self: (id(self._set), self._row) + tuple(self._value(name) for name in POSE_COLUMNS))
+
+
+    @property
+    def camera(self):
+        return self._set.cameras[self._set.columns["camera"][self._row]]
+
+
+    @camera.setter
+    def camera(self, camera):
+        self._set.columns["camera"][self._row] = self._set._camera(camera)
+        self._update_bounds()
+
+
+    def set_pose(self, coordinate, roll, pitch, heading):
+        '''
+        Replace the position and attitude of the row, as GeoImage.set_pose does.
+        Input:  coordinate - Coordinate of the sensor, altitude above ground in meters
+                roll, pitch, heading - attitude of the sensor in degrees
+
+        Stored footprint bounds are recomputed for the new pose.
+        '''
+        pose = Pose.from_degrees(coordinate, roll, pitch, heading)
+        for name in POSE_COLUMNS:
+            self._set.columns[name][self._row] = getattr(pose, name)
+        self._set.rotations[self._row] = pose.rotation
+        self._update_bounds()
+
+
+    def _update_bounds(self):
+        if not np.isnan(self._set.bounds[self._row]).all():
+            lat, lon = self.footprint()
+            self._set.bounds[self._row] = (lat.min(), lat.max(), lon.min(), lon.max())
+
+
+    def without_pixels(self):
+        '''
+        Output: a standalone geometry-only GeoImage of the row, cheap to pickle without the set
+        '''
+        clone = GeoImage(None, self.coordinate, 0, 0, 0, camera=self.camera, index=self.index)
+        clone.pose = self.pose # already in the stored conventions
+        return clone
@@ -10,6 +10,7 @@ Version: v2.1.0
 """
 
 from math import atan, tan, cos, sin, hypot
+import numpy as np
 
 class GeoSensor:
     # CONSTANTS -- Depending on the sensor, these values may change
@@ -173,6 +174,106 @@ class GeoSensor:
         yOffset = self.getYOffset(height, pitch, angleY)
         xOffset = self.getXOffset(height, pitch, angleX, angleY)
         return xOffset, yOffset
+
+    def pixelToPhysicalArray(self, x, y) -> tuple:
+        '''
+        Input:  x, y - array-likes of pixel coordinates
+        Output: physicalX, physicalY - arrays of physical distances from the bottom left of the sensor in meters
+
+        Array counterpart of pixelToPhysical.
+
+        >>> geoSensor = GeoSensor()
+        >>> x, y = geoSensor.pixelToPhysicalArray([0, 1440, 960], [0, 540, 810])
+        >>> np.allclose(x, [0.0, 0.027, 0.018], rtol=1e-4)
+        True
+        >>> np.allclose(y, [0.0, 0.01015, 0.015225], rtol=1e-4)
+        True
+        '''
+        physicalY = np.asarray(y, dtype=np.float64) * (GeoSensor.SENSOR_HEIGHT / GeoSensor.RESOLUTION_Y)
+        physicalX = np.asarray(x, dtype=np.float64) * (GeoSensor.SENSOR_WIDTH / GeoSensor.RESOLUTION_X)
+
+        return physicalX, physicalY
+
+    def physicalToAngleArray(self, physicalX, physicalY, roll) -> tuple:
+        '''
+        Input:  physicalX, physicalY - array-likes of physical distances from the bottom left of the sensor in meters
+                roll - roll of the sensor in radians, scalar or one per point
+        Output: angleX, angleY - arrays of angles in radians from the center of the sensor
+
+        Array counterpart of physicalToAngle.
+
+        >>> geoSensor = GeoSensor()
+        >>> physicalX, physicalY = geoSensor.pixelToPhysicalArray([960, 1120, 1440], [540, 540, 540])
+        >>> x, y = geoSensor.physicalToAngleArray(physicalX, physicalY, 0)
+        >>> np.allclose(x, [0.0, 0.1974, 0.54042], rtol=1e-4)
+        True
+        >>> np.allclose(y, 0.0)
+        True
+        '''
+        xRelToCenter = np.asarray(physicalX, dtype=np.float64) - (GeoSensor.SENSOR_WIDTH / 2)
+        yRelToCenter = np.asarray(physicalY, dtype=np.float64) - (GeoSensor.SENSOR_HEIGHT / 2)
+        cosRoll, sinRoll = np.cos(roll), np.sin(roll)
+        rollAdjustedRelToCenterX = cosRoll * xRelToCenter - sinRoll * yRelToCenter
+        rollAdjustedRelToCenterY = sinRoll * xRelToCenter + cosRoll * yRelToCenter
+
+        angleX = np.arctan(rollAdjustedRelToCenterX / np.hypot(GeoSensor.FOCAL_LENGTH, rollAdjustedRelToCenterY))
+        angleY = np.arctan(rollAdjustedRelToCenterY / GeoSensor.FOCAL_LENGTH)
+
+        return angleX, angleY
+
+    def getYOffsetArray(self, altitude, pitch, angleY):
+        '''
+        Input:  altitude - height of the sensor from the ground in meters, scalar or one per point
+                pitch - pitch of the sensor in radians, scalar or one per point
+                angleY - array-like of angles in the y direction in radians
+        Output: yOffset - array of offsets in the y direction in meters
+
+        Array counterpart of getYOffset.
+        '''
+        return altitude * np.tan(np.asarray(angleY, dtype=np.float64) + pitch)
+
+    def getXOffsetArray(self, altitude, pitch, angleX, angleY):
+        '''
+        Input:  altitude - height of the sensor from the ground in meters, scalar or one per point
+                pitch - pitch of the sensor in radians, scalar or one per point
+                angleX, angleY - array-likes of angles in the x and y directions in radians
+        Output: xOffset - array of offsets in the x direction in meters
+
+        Array counterpart of getXOffset.
+        '''
+        return altitude / np.cos(np.asarray(angleY, dtype=np.float64) + pitch) * np.tan(angleX)
+
+    def geoSensorIOArray(self, x, y, height, roll, pitch) -> tuple:
+        '''
+        Input:  x, y - array-likes of pixel coordinates
+                height - height of the sensor from the ground in meters, scalar or one per point
+                roll - roll of the sensor in radians, scalar or one per point
+                pitch - pitch of the sensor in radians, scalar or one per point
+        Output: xOffset, yOffset - arrays of offsets in the x and y directions in meters
+
+        Array counterpart of geoSensorIO, converting many detections in one call.
+
+        TESTS BUILT FOR 0.015 FOCAL LENGTH, 0.036 SENSOR WIDTH, 0.0203 SENSOR HEIGHT
+
+        >>> geoSensor = GeoSensor()
+        >>> x, y = geoSensor.geoSensorIOArray([960, 1120, 1440, 1440], [540, 540, 540, 60], 100, 0, 0)
+        >>> np.allclose(x, [0.0, 20.0, 60, 60], rtol=1e-4)
+        True
+        >>> np.allclose(y, [0.0, 0.0, 0.0, -60.148148148], rtol=1e-4)
+        True
+        >>> roll = [0, 0, 0.1745, 0.1745]
+        >>> pitch = [0.1745, 0.1745, 0, 0.1745]
+        >>> x, y = geoSensor.geoSensorIOArray([960, 1400, 1400, 1400], [400, 844, 236, 236], 100, roll, pitch)
+        >>> np.allclose(x, [0.0, 59.86873, 60.77843, 58.81588], rtol=1e-4)
+        True
+        >>> np.allclose(y, [0.083511, 59.73472, -27.96645, -9.85144], rtol=1e-4)
+        True
+        '''
+        physicalX, physicalY = self.pixelToPhysicalArray(x, y)
+        angleX, angleY = self.physicalToAngleArray(physicalX, physicalY, roll)
+        yOffset = self.getYOffsetArray(height, pitch, angleY)
+        xOffset = self.getXOffsetArray(height, pitch, angleX, angleY)
+        return xOffset, yOffset
     
 
 
@@ -0,0 +1,132 @@
+'''
+image_cache.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides a process-wide LRU cache for decoded image pixels with a configurable byte budget.
+Version: v1.0.0
+'''
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024 # about 13 full resolution 4056x3040 frames
+
+
+class ImageCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        '''
+        max_bytes: maximum total size of the cached images in bytes
+
+        Images are evicted least recently used first once the budget is exceeded. Images larger
+        than the whole budget are returned but never cached.
+
+        >>> import numpy as np
+        >>> cache = ImageCache(max_bytes=300)
+        >>> for key in "abc":
+        ...     cache.put(key, np.zeros(100, dtype=np.uint8))
+        >>> _ = cache.get("a", None) # a becomes the most recently used
+        >>> cache.put("d", np.zeros(100, dtype=np.uint8))
+        >>> sorted(cache._images), cache.nbytes
+        (['a', 'c', 'd'], 300)
+        >>> big = cache.get("big", lambda: np.zeros(400, dtype=np.uint8))
+        >>> big.nbytes, "big" in cache, cache.hits, cache.misses
+        (400, False, 1, 1)
+        >>> cache.set_budget(150)
+        >>> sorted(cache._images), cache.nbytes
+        (['d'], 100)
+        '''
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._images)
+
+
+    def __contains__(self, key):
+        return key in self._images
+
+
+    def get(self, key, loader):
+        '''
+        Get an image from the cache, decoding it on a miss.
+        Input:  key - hashable key identifying the image (usually its path)
+                loader - callable returning the decoded image
+        Output: decoded image
+
+        The loader runs outside the lock so that several threads can decode at once.
+        '''
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+
+        image = loader()
+        self.put(key, image)
+        return image
+
+
+    def put(self, key, image):
+        '''
+        Add a decoded image to the cache, evicting the least recently used images over budget.
+        Input:  key - hashable key identifying the image
+                image - decoded image (numpy array)
+        '''
+        size = image.nbytes
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._images:
+                self.nbytes -= self._images.pop(key).nbytes
+            self._images[key] = image
+            self.nbytes += size
+            self._evict()
+
+
+    def set_budget(self, max_bytes):
+        '''
+        Change the byte budget, evicting images if the cache is now over budget.
+        Input:  max_bytes - maximum total size of the cached images in bytes
+        '''
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.nbytes = 0
+
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            _, image = self._images.popitem(last=False)
+            self.nbytes -= image.nbytes
+
+
+# shared by every GeoImage in the process
+IMAGE_CACHE = ImageCache()
+
+
+def set_cache_budget(max_bytes):
+    '''
+    Set the byte budget of the process-wide image cache.
+    Input:  max_bytes - maximum total size of the cached images in bytes
+
+    >>> previous = IMAGE_CACHE.max_bytes
+    >>> set_cache_budget(1024)
+    >>> IMAGE_CACHE.max_bytes, IMAGE_CACHE.nbytes <= 1024
+    (1024, True)
+    >>> set_cache_budget(previous)
+    '''
+    IMAGE_CACHE.set_budget(max_bytes)
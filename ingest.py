@@ -0,0 +1,433 @@
+'''
+ingest.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides an asyncio service that joins frames, telemetry and detections by timestamp and emits geolocated targets.
+Version: v1.0.0
+'''
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+import numpy as np
+from geo_core import Coordinate
+from geo_image import GeoImage
+from geo_image_set import GeoImageSet
+from telemetry import TelemetryBuffer
+
+DROP_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class FrameMetadata:
+    def __init__(self, frame_id, timestamp, res_x, res_y, sensor_width, sensor_height, fov, image=None):
+        '''
+        frame_id: unique identifier of the frame
+        timestamp: capture time of the frame in seconds, on the camera clock
+        res_x, res_y: resolution of the frame in pixels
+        sensor_width, sensor_height: size of the sensor in mm
+        fov: diagonal field of view in degrees or radians
+        image: optional image, path or loader passed on to the GeoImage
+        '''
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.res_x = res_x
+        self.res_y = res_y
+        self.sensor_width = sensor_width
+        self.sensor_height = sensor_height
+        self.fov = fov
+        self.image = image
+
+
+class TelemetryMessage:
+    def __init__(self, timestamp, lat, lon, alt, roll, pitch, heading):
+        '''
+        timestamp: time of the sample in seconds, on the autopilot clock
+        lat, lon: position in degrees
+        alt: altitude above ground in meters
+        roll, pitch, heading: attitude in degrees
+        '''
+        self.timestamp = timestamp
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+        self.roll = roll
+        self.pitch = pitch
+        self.heading = heading
+
+
+class Detections:
+    def __init__(self, frame_id, x, y):
+        '''
+        frame_id: identifier of the frame the detections were made in
+        x, y: array-likes of pixel coordinates, one entry per detection
+        '''
+        self.frame_id = frame_id
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.received = None # set by the service when the detections are queued
+
+
+class GeolocatedTargets:
+    def __init__(self, frame_id, lat, lon, latency, clamped):
+        '''
+        frame_id: identifier of the frame the targets were detected in
+        lat, lon: arrays of target coordinates in degrees
+        latency: seconds from queuing the detections to emitting the targets
+        clamped: True if the frame was outside the telemetry and the nearest pose was used
+        '''
+        self.frame_id = frame_id
+        self.lat = lat
+        self.lon = lon
+        self.latency = latency
+        self.clamped = clamped
+
+
+class IngestService:
+    def __init__(self, queue_size=64, drop_policy="drop_oldest", max_wait=0.5, batch_size=32,
+                 max_frames=256, telemetry_capacity=90000, clock_offset=0.0, logger=None):
+        '''
+        queue_size: capacity of each input queue and of the output queue
+        drop_policy: what to do when a queue is full; "block" applies backpressure to the producer,
+                     "drop_oldest" discards the oldest queued message and "drop_newest" discards the new one
+        max_wait: longest time in seconds detections wait for their frame or for telemetry covering
+                  the frame; after that the nearest pose is used, or the detections are dropped if the
+                  frame never arrived
+        batch_size: maximum number of detection messages geolocated together, in one projection over all their frames
+        max_frames: number of recent frames kept for joining
+        telemetry_capacity: number of telemetry samples kept
+        clock_offset: seconds added to frame timestamps to convert them to the autopilot clock
+        logger: logger object for logging
+
+        Messages queued together are geolocated in one projection, with the same results as
+        projecting each frame on its own. With drop_policy "block" a full output queue holds the
+        service back until the consumer catches up, so no targets are lost.
+
+        >>> async def run():
+        ...     async with IngestService(queue_size=1, drop_policy="block") as service:
+        ...         await service.put_telemetry(TelemetryMessage(0, 38.3155, -76.5509, 20, 0, 0, 0))
+        ...         await service.put_telemetry(TelemetryMessage(10, 38.3165, -76.5509, 20, 0, 0, 0))
+        ...         for frame_id in range(3):
+        ...             await service.put_frame(FrameMetadata(frame_id, 2 * frame_id, 4056, 3040, 6.29, 4.71, 78.3))
+        ...             await service.put_detections(Detections(frame_id, [2028, 0], [1520, 0]))
+        ...         targets = []
+        ...         for _ in range(3):
+        ...             await asyncio.sleep(0.05) # a slow consumer
+        ...             targets.append(await service.output.get())
+        ...         return targets, service.dropped["output"]
+        >>> targets, dropped = asyncio.run(run())
+        >>> [target.frame_id for target in targets], dropped
+        ([0, 1, 2], 0)
+        >>> image = GeoImage(None, Coordinate(38.3157, -76.5509, 20, use_int=False), 0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3)
+        >>> lat, lon, _ = image.get_coordinates_batch([2028, 0], [1520, 0])
+        >>> bool(np.allclose(targets[1].lat, lat, rtol=0, atol=1e-9)), bool(np.allclose(targets[1].lon, lon, rtol=0, atol=1e-9))
+        (True, True)
+        '''
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {DROP_POLICIES}")
+        self.drop_policy = drop_policy
+        self.max_wait = max_wait
+        self.batch_size = batch_size
+        self.max_frames = max_frames
+        self.clock_offset = clock_offset
+        self.logger = logger
+
+        self.frames = asyncio.Queue(queue_size)
+        self.telemetry_messages = asyncio.Queue(queue_size)
+        self.detections = asyncio.Queue(queue_size)
+        self.output = asyncio.Queue(queue_size)
+
+        self.telemetry = TelemetryBuffer(telemetry_capacity)
+        self.dropped = {"frames": 0, "telemetry": 0, "detections": 0, "output": 0, "unmatched": 0}
+        self._frames = OrderedDict()
+        self._pending = []
+        self._updated = asyncio.Event()
+        self._tasks = []
+
+
+    async def _put(self, queue, name, message):
+        if self.drop_policy == "block":
+            await queue.put(message)
+            return
+        if queue.full():
+            self.dropped[name] += 1
+            if self.drop_policy == "drop_newest":
+                return
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+
+    async def put_frame(self, frame):
+        await self._put(self.frames, "frames", frame)
+
+
+    async def put_telemetry(self, message):
+        await self._put(self.telemetry_messages, "telemetry", message)
+
+
+    async def put_detections(self, detections):
+        detections.received = time.monotonic()
+        await self._put(self.detections, "detections", detections)
+
+
+    async def start(self):
+        '''
+        Start the ingest tasks.
+        '''
+        self._tasks = [
+            asyncio.create_task(self._telemetry_loop()),
+            asyncio.create_task(self._frame_loop()),
+            asyncio.create_task(self._detection_loop()),
+        ]
+
+
+    async def stop(self):
+        '''
+        Cancel the ingest tasks.
+        '''
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+    async def _telemetry_loop(self):
+        while True:
+            message = await self.telemetry_messages.get()
+            messages = [message]
+            while not self.telemetry_messages.empty():
+                messages.append(self.telemetry_messages.get_nowait())
+            for message in messages:
+                if self.telemetry.end_time is not None and message.timestamp <= self.telemetry.end_time:
+                    self.dropped["telemetry"] += 1 # out of order
+                    continue
+                self.telemetry.append(message.timestamp, message.lat, message.lon, message.alt,
+                                      message.roll, message.pitch, message.heading)
+            self._updated.set()
+
+
+    async def _frame_loop(self):
+        while True:
+            frame = await self.frames.get()
+            self._frames[frame.frame_id] = frame
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+            self._updated.set()
+
+
+    async def _detection_loop(self):
+        while True:
+            # wait for new detections, or for frames or telemetry that may complete pending ones
+            if self._pending:
+                getter = asyncio.create_task(self.detections.get())
+                updated = asyncio.create_task(self._updated.wait())
+                oldest = min(detections.received for detections in self._pending)
+                timeout = max(0.0, oldest + self.max_wait - time.monotonic())
+                done, _ = await asyncio.wait({getter, updated}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                updated.cancel()
+                if getter in done:
+                    self._pending.append(getter.result())
+                elif not getter.cancel():
+                    self._pending.append(getter.result())
+            else:
+                self._pending.append(await self.detections.get())
+            self._updated.clear()
+
+            while not self.detections.empty() and len(self._pending) < self.batch_size:
+                self._pending.append(self.detections.get_nowait())
+
+            await self._process_pending()
+
+
+    async def _process_pending(self):
+        now = time.monotonic()
+        waiting = []
+        ready = []
+        for detections in self._pending:
+            expired = now - detections.received >= self.max_wait
+            frame = self._frames.get(detections.frame_id)
+            if frame is None:
+                if expired:
+                    self.dropped["unmatched"] += 1
+                else:
+                    waiting.append(detections)
+                continue
+
+            timestamp = frame.timestamp + self.clock_offset
+            covered = self.telemetry.covers(timestamp)
+            if not covered and (len(self.telemetry) == 0 or not expired):
+                if expired:
+                    self.dropped["unmatched"] += 1
+                else:
+                    waiting.append(detections)
+                continue
+
+            ready.append((frame, timestamp, detections, not covered))
+        self._pending = waiting
+        if ready:
+            await self._emit(ready)
+
+
+    async def _emit(self, ready):
+        '''
+        Geolocate the detections of several messages in one projection and queue the results.
+        Input:  ready - list of (frame, timestamp, detections, clamped) tuples
+        '''
+        poses = self.telemetry.interpolate([timestamp for _, timestamp, _, _ in ready])
+        images = GeoImageSet(len(ready))
+        for i, (frame, _, _, _) in enumerate(ready):
+            images.append(GeoImage(
+                image=frame.image,
+                coordinate=Coordinate(float(poses["lat"][i]), float(poses["lon"][i]), float(poses["alt"][i]), use_int=False),
+                roll=float(poses["roll"][i]),
+                pitch=float(poses["pitch"][i]),
+                heading=float(poses["heading"][i]),
+                res_x=frame.res_x,
+                res_y=frame.res_y,
+                sensor_width=frame.sensor_width,
+                sensor_height=frame.sensor_height,
+                fov=frame.fov,
+                index=frame.frame_id
+            ), footprint=False)
+
+        x = [np.asarray(detections.x, dtype=np.float64) for _, _, detections, _ in ready]
+        y = [np.asarray(detections.y, dtype=np.float64) for _, _, detections, _ in ready]
+        sizes = [values.size for values in x]
+        rows = np.repeat(np.arange(len(ready)), sizes)
+        lat, lon, _ = images.get_coordinates(rows, np.concatenate([values.ravel() for values in x]),
+                                             np.concatenate([values.ravel() for values in y]))
+        splits = np.cumsum(sizes)[:-1]
+
+        for (frame, _, detections, clamped), shape, frame_lat, frame_lon in zip(
+                ready, [values.shape for values in x], np.split(lat, splits), np.split(lon, splits)):
+            targets = GeolocatedTargets(frame.frame_id, frame_lat.reshape(shape), frame_lon.reshape(shape),
+                                        time.monotonic() - detections.received, clamped)
+            # "block" waits for the consumer, the drop policies discard targets instead
+            await self._put(self.output, "output", targets)
+
+        if self.logger:
+            self.logger.info("Geolocated %s detections in %s frames", lat.size, len(ready))
+
+
+class FakeTelemetrySource:
+    def __init__(self, lat, lon, alt=20, heading=90, speed=15, rate=50):
+        '''
+        lat, lon: start position in degrees
+        alt: altitude above ground in meters
+        heading: course in degrees
+        speed: ground speed in meters per second
+        rate: samples per second
+
+        Flies a straight line at constant speed, for testing the ingest service without an autopilot.
+        '''
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+        self.heading = heading
+        self.speed = speed
+        self.rate = rate
+
+
+    def sample(self, timestamp):
+        distance = self.speed * timestamp
+        north = distance * math.cos(math.radians(self.heading))
+        east = distance * math.sin(math.radians(self.heading))
+        lat = self.lat + math.degrees(north / 6371000)
+        lon = self.lon + math.degrees(east / 6371000) / math.cos(math.radians(self.lat))
+        return TelemetryMessage(timestamp, lat, lon, self.alt, 0, 0, self.heading)
+
+
+    async def run(self, service, duration, start=None):
+        '''
+        Input:  service - IngestService receiving the telemetry
+                duration - seconds to run for
+                start - monotonic time of timestamp 0, defaults to now
+        '''
+        start = time.monotonic() if start is None else start
+        while (now := time.monotonic() - start) < duration:
+            await service.put_telemetry(self.sample(now))
+            await asyncio.sleep(1 / self.rate)
+
+
+class FakeDetector:
+    def __init__(self, frame_rate=5, detections_per_frame=10, res_x=4056, res_y=3040, sensor_width=6.29,
+                 sensor_height=4.71, fov=78.3, seed=0):
+        '''
+        frame_rate: frames per second
+        detections_per_frame: number of detections emitted for each frame
+        res_x, res_y, sensor_width, sensor_height, fov: camera intrinsics of the frames
+        seed: random seed for the detection pixels
+
+        Emits frame metadata and random detections, for testing the ingest service without a camera.
+        '''
+        self.frame_rate = frame_rate
+        self.detections_per_frame = detections_per_frame
+        self.res_x = res_x
+        self.res_y = res_y
+        self.sensor_width = sensor_width
+        self.sensor_height = sensor_height
+        self.fov = fov
+        self.rng = np.random.default_rng(seed)
+
+
+    async def run(self, service, duration, start=None):
+        '''
+        Input:  service - IngestService receiving the frames and detections
+                duration - seconds to run for
+                start - monotonic time of timestamp 0, defaults to now
+        '''
+        start = time.monotonic() if start is None else start
+        frame_id = 0
+        while (now := time.monotonic() - start) < duration:
+            await service.put_frame(FrameMetadata(frame_id, now, self.res_x, self.res_y,
+                                                  self.sensor_width, self.sensor_height, self.fov))
+            x = self.rng.uniform(0, self.res_x, self.detections_per_frame)
+            y = self.rng.uniform(0, self.res_y, self.detections_per_frame)
+            await service.put_detections(Detections(frame_id, x, y))
+            frame_id += 1
+            await asyncio.sleep(1 / self.frame_rate)
+
+
+async def simulate(duration=1.0, frame_rate=20, detections_per_frame=200, **kwargs):
+    '''
+    Run the ingest service against the fake telemetry source and fake detector.
+    Input:  duration - seconds to run for
+            frame_rate - frames per second of the fake detector
+            detections_per_frame - detections per frame of the fake detector
+            kwargs - passed on to IngestService
+    Output: list of GeolocatedTargets and the service
+
+    Frames are emitted in order with every detection geolocated. Timing is measured by benchmark.py.
+
+    >>> targets, service = asyncio.run(simulate(duration=0.5, max_wait=0.2))
+    >>> frame_ids = [target.frame_id for target in targets]
+    >>> len(targets) > 0, frame_ids == sorted(set(frame_ids))
+    (True, True)
+    >>> {len(target.lat) for target in targets}, all(target.latency >= 0 for target in targets)
+    ({200}, True)
+    '''
+    targets = []
+    async with IngestService(**kwargs) as service:
+        start = time.monotonic()
+        telemetry = FakeTelemetrySource(38.3155, -76.5509)
+        detector = FakeDetector(frame_rate, detections_per_frame)
+
+        async def collect():
+            while True:
+                targets.append(await service.output.get())
+
+        collector = asyncio.create_task(collect())
+        await asyncio.gather(telemetry.run(service, duration, start), detector.run(service, duration, start))
+        await asyncio.sleep(service.max_wait)
+        collector.cancel()
+    return targets, service
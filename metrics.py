@@ -0,0 +1,205 @@
+'''
+metrics.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides opt-in call counts, latency histograms and throughput for the geolocation hot paths.
+Version: v1.0.0
+'''
+
+import functools
+import inspect
+import json
+import threading
+import time
+import numpy as np
+
+HISTOGRAM_BUCKETS = 32 # bucket b counts calls taking [2^(b-1), 2^b) microseconds
+
+_enabled = False
+_lock = threading.Lock()
+_stats = {}
+
+
+class _Stat:
+    __slots__ = ("count", "points", "total_time", "max_time", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.points = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (HISTOGRAM_BUCKETS + 1)
+
+
+def enable():
+    '''
+    Start recording metrics for instrumented functions.
+    '''
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    '''
+    Stop recording metrics. Instrumented functions then only pay for a single flag check.
+    '''
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    '''
+    Discard all recorded metrics.
+    '''
+    with _lock:
+        _stats.clear()
+
+
+def record(name, elapsed, points=1):
+    '''
+    Record one call.
+    Input:  name - name of the instrumented operation
+            elapsed - duration of the call in seconds
+            points - number of points processed by the call
+
+    Bucket b of the histogram counts calls of [2^(b-1), 2^b) microseconds, keyed by its upper bound.
+
+    >>> reset()
+    >>> for elapsed in (0.5e-6, 1e-6, 3.9e-6, 4e-6, 1.0):
+    ...     record("op", elapsed)
+    >>> snapshot()["op"]["histogram_us"]
+    {'1': 1, '2': 1, '4': 1, '8': 1, '1048576': 1}
+    >>> reset()
+    '''
+    bucket = min(int(elapsed * 1e6).bit_length(), HISTOGRAM_BUCKETS)
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = _Stat()
+        stat.count += 1
+        stat.points += points
+        stat.total_time += elapsed
+        stat.max_time = max(stat.max_time, elapsed)
+        stat.histogram[bucket] += 1
+
+
+def instrument(name, points=None):
+    '''
+    Decorator recording calls to a function while metrics are enabled.
+    Input:  name - name of the instrumented operation
+            points - optional name of the array argument holding the points of a batch function,
+                     or a callable taking the bound arguments and returning the number of points.
+                     Each call counts one point otherwise.
+
+    >>> @instrument("double", points="values")
+    ... def double(values):
+    ...     return [2 * value for value in values]
+    >>> reset()
+    >>> _ = double([1, 2, 3])
+    >>> snapshot()
+    {}
+    >>> enable()
+    >>> _ = double([1, 2, 3]), double([4])
+    >>> disable()
+    >>> _ = double([5])
+    >>> stats = snapshot()["double"]
+    >>> stats["count"], stats["points"], is_enabled()
+    (2, 4, False)
+    >>> reset()
+    '''
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        def count(args, kwargs):
+            if points is None:
+                return 1
+            arguments = signature.bind(*args, **kwargs).arguments
+            if callable(points):
+                return int(points(arguments))
+            return int(np.size(arguments[points]))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            record(name, elapsed, count(args, kwargs))
+            return result
+        return wrapper
+    return decorator
+
+
+def _percentile(histogram, count, fraction):
+    '''
+    Upper bound in seconds of the histogram bucket holding the given fraction of calls.
+    '''
+    target = fraction * count
+    seen = 0
+    for bucket, calls in enumerate(histogram):
+        seen += calls
+        if seen >= target:
+            return (1 << bucket) / 1e6
+    return (1 << HISTOGRAM_BUCKETS) / 1e6
+
+
+def snapshot():
+    '''
+    Output: dict of recorded metrics per operation
+
+    Each entry holds the call and point counts, total, mean and max latency in seconds,
+    approximate p50/p90/p99 latencies (histogram bucket upper bounds), points per second
+    of time spent in the call, and the raw histogram.
+
+    >>> reset()
+    >>> record("op", 0.002, points=100)
+    >>> record("op", 0.004, points=300)
+    >>> stats = snapshot()["op"]
+    >>> stats["count"], stats["points"], round(stats["total_time"], 6), round(stats["mean_time"], 6), stats["max_time"]
+    (2, 400, 0.006, 0.003, 0.004)
+    >>> stats["p50_time"], stats["p99_time"], round(stats["points_per_second"]), stats["histogram_us"]
+    (0.002048, 0.004096, 66667, {'2048': 1, '4096': 1})
+    >>> reset()
+    '''
+    with _lock:
+        result = {}
+        for name, stat in _stats.items():
+            result[name] = {
+                "count": stat.count,
+                "points": stat.points,
+                "total_time": stat.total_time,
+                "mean_time": stat.total_time / stat.count,
+                "max_time": stat.max_time,
+                "p50_time": _percentile(stat.histogram, stat.count, 0.5),
+                "p90_time": _percentile(stat.histogram, stat.count, 0.9),
+                "p99_time": _percentile(stat.histogram, stat.count, 0.99),
+                "points_per_second": stat.points / stat.total_time if stat.total_time > 0 else 0.0,
+                "histogram_us": {str(1 << bucket): calls for bucket, calls in enumerate(stat.histogram) if calls},
+            }
+        return result
+
+
+def export_json(path):
+    '''
+    Write a snapshot of the recorded metrics to a JSON file.
+    Input:  path - output file path
+
+    >>> import os, tempfile
+    >>> reset()
+    >>> record("op", 0.002, points=100)
+    >>> path = os.path.join(tempfile.mkdtemp(), "metrics.json")
+    >>> export_json(path)
+    >>> with open(path) as file:
+    ...     exported = json.load(file)
+    >>> exported["metrics"] == snapshot()
+    True
+    >>> reset()
+    '''
+    with open(path, "w") as file:
+        json.dump({"timestamp": time.time(), "metrics": snapshot()}, file, indent=2)
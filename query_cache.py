@@ -0,0 +1,113 @@
+'''
+query_cache.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides an LRU cache for the results of repeated scalar pixel and coordinate queries on GeoImage frames.
+Version: v1.0.0
+'''
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 65536
+DEFAULT_PIXEL_STEP = 1 # pixels
+DEFAULT_DEGREE_STEP = 1e-7 # degrees, about 1 cm
+
+
+class QueryCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, pixel_step=DEFAULT_PIXEL_STEP, degree_step=DEFAULT_DEGREE_STEP):
+        '''
+        max_entries: maximum number of cached results, shared by every frame using the cache
+        pixel_step: size of the grid pixel queries are snapped to, in pixels
+        degree_step: size of the grid coordinate queries are snapped to, in degrees
+
+        Queries are snapped to the center of their grid cell before being computed, so a cached
+        result is exactly what the frame returns for the snapped query, whichever query filled it.
+        Coarser steps raise the hit rate at the cost of up to half a step of error.
+        '''
+        self.max_entries = max_entries
+        self.pixel_step = pixel_step
+        self.degree_step = degree_step
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._results)
+
+
+    @property
+    def hit_rate(self):
+        '''
+        Fraction of the lookups answered from the cache, None before the first lookup.
+        '''
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+    def quantize(self, a, b, step):
+        '''
+        Input:  a, b - query values
+                step - grid size
+        Output: key - integer grid cell of the query
+                a, b - center of the grid cell
+        '''
+        i, j = round(a / step), round(b / step)
+        return (i, j), i * step, j * step
+
+
+    def get(self, key, compute):
+        '''
+        Get a result from the cache, computing it on a miss.
+        Input:  key - hashable key identifying the query, including the frame and pose it was made on
+                compute - callable returning the result
+        Output: result of the query
+
+        compute runs outside the lock so that several threads can query at once.
+        '''
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+            self.misses += 1
+
+        result = compute()
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            self._evict()
+        return result
+
+
+    def set_budget(self, max_entries):
+        '''
+        Change the maximum number of cached results, evicting results if the cache is now over budget.
+        Input:  max_entries - maximum number of cached results
+        '''
+        with self._lock:
+            self.max_entries = max_entries
+            self._evict()
+
+
+    def reset_counters(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+    def _evict(self):
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+
+# shared by every GeoImage that opts in with query_cache=QUERY_CACHE
+QUERY_CACHE = QueryCache()
@@ -0,0 +1,162 @@
+'''
+session.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module saves and reopens flight sessions (frame poses, intrinsics, image paths, footprints and detections) as a directory of memory-mappable numpy columns.
+Version: v1.0.0
+'''
+
+import json
+import os
+import numpy as np
+from geo_core import CameraModel
+from geo_image_set import POSE_COLUMNS, GeoImageSet
+
+SESSION_VERSION = 1
+MANIFEST = "manifest.json"
+FRAME_COLUMNS = POSE_COLUMNS + ("camera", "index")
+DETECTION_COLUMNS = ("row", "x", "y", "lat", "lon")
+
+
+class Session:
+    def __init__(self, images, footprint_lat, footprint_lon, detections, path=None):
+        '''
+        images: GeoImageSet of the frames
+        footprint_lat, footprint_lon: arrays of shape (frames, vertices) of the footprint polygons
+        detections: dict of detection columns, "row" (frame row), "x", "y" (pixels) and "lat", "lon" (geolocated)
+        path: directory the session was loaded from, None if it was never saved
+        '''
+        self.images = images
+        self.footprint_lat = footprint_lat
+        self.footprint_lon = footprint_lon
+        self.detections = detections
+        self.path = path
+
+
+    def __len__(self):
+        return len(self.images)
+
+
+    @classmethod
+    def from_images(cls, images, rows=(), x=(), y=(), samples_per_edge=4):
+        '''
+        Build a session, precomputing the footprints and geolocating the detections.
+        Input:  images - GeoImageSet, or iterable of GeoImage objects
+                rows - array-like of the frame row of each detection
+                x, y - array-likes of the pixel coordinates of each detection
+                samples_per_edge - number of points sampled along each image edge for the footprints
+        Output: Session object
+        '''
+        if not isinstance(images, GeoImageSet):
+            images = list(images)
+            image_set = GeoImageSet(max(len(images), 1))
+            for image in images:
+                image_set.append(image, footprint=False)
+            images = image_set
+        footprint_lat, footprint_lon = images.footprints(samples_per_edge)
+        images.bounds[:len(images)] = np.stack([footprint_lat.min(axis=1), footprint_lat.max(axis=1),
+                                                footprint_lon.min(axis=1), footprint_lon.max(axis=1)], axis=1)
+
+        rows = np.asarray(rows, dtype=np.int64)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        lat, lon, _ = images.get_coordinates(rows, x, y)
+        detections = {"row": rows, "x": x, "y": y, "lat": lat, "lon": lon}
+        return cls(images, footprint_lat, footprint_lon, detections)
+
+
+    def save(self, path):
+        '''
+        Write the session to a directory, one .npy file per column.
+        Input:  path - directory, created if missing
+        '''
+        os.makedirs(path, exist_ok=True)
+        images = self.images
+        for name in FRAME_COLUMNS:
+            np.save(os.path.join(path, f"{name}.npy"), images.column(name))
+        np.save(os.path.join(path, "rotations.npy"), images.rotations[:len(images)])
+        np.save(os.path.join(path, "bounds.npy"), images.bounds[:len(images)])
+        np.save(os.path.join(path, "footprint_lat.npy"), self.footprint_lat)
+        np.save(os.path.join(path, "footprint_lon.npy"), self.footprint_lon)
+        for name in DETECTION_COLUMNS:
+            np.save(os.path.join(path, f"detection_{name}.npy"), self.detections[name])
+
+        # only paths can be stored, frames loaded from memory or callables come back geometry only,
+        # paths are stored relative to the session so they resolve wherever it is loaded from
+        directory = os.path.abspath(path)
+        manifest = {
+            "version": SESSION_VERSION,
+            "frames": len(images),
+            "detections": len(self.detections["row"]),
+            "cameras": [list(camera.key) for camera in images.cameras],
+            "sources": [os.path.relpath(os.path.abspath(source), directory) if isinstance(source, (str, os.PathLike)) else None
+                        for source in images.sources],
+        }
+        with open(os.path.join(path, MANIFEST), "w") as file:
+            json.dump(manifest, file)
+        self.path = path
+
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        '''
+        Reopen a session written by save.
+        Input:  path - session directory
+                mmap - memory-map the columns instead of reading them
+        Output: Session object
+
+        No pixels are decoded and nothing is recomputed, so reopening costs a few file opens.
+        Image paths are resolved against the session directory and returned as absolute paths.
+
+        >>> import pathlib, tempfile
+        >>> from geo_core import Coordinate
+        >>> from geo_image import GeoImage
+        >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+        >>> images = [GeoImage(pathlib.Path(f"frame{i}.png"), coordinate.offset_coordinate(10 * i, 90),
+        ...                    0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3, index=i) for i in range(3)]
+        >>> session = Session.from_images(images, rows=[0, 2], x=[2028, 0], y=[1520, 0])
+        >>> directory = tempfile.mkdtemp()
+        >>> session.save(directory)
+        >>> loaded = Session.load(directory)
+        >>> len(loaded), isinstance(loaded.images.rotations, np.memmap)
+        (3, True)
+        >>> loaded.images.sources[1] == os.path.abspath("frame1.png")
+        True
+        >>> bool(np.array_equal(loaded.footprint_lat, session.footprint_lat))
+        True
+        >>> bool(np.allclose(loaded.footprint_lat[1], images[1].footprint()[0]))
+        True
+        >>> loaded.images.contains([coordinate.lat], [coordinate.lon]).ravel().tolist()
+        [True, True, False]
+        >>> lat, lon = loaded.detections_in(0)
+        >>> bool(abs(lat[0] - coordinate.lat) < 1e-9)
+        True
+        '''
+        with open(os.path.join(path, MANIFEST)) as file:
+            manifest = json.load(file)
+        if manifest.get("version") != SESSION_VERSION:
+            raise ValueError(f"Session {path} has version {manifest.get('version')}, expected {SESSION_VERSION}")
+
+        mmap_mode = "r" if mmap else None
+        def column(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        directory = os.path.abspath(path)
+        sources = [os.path.normpath(os.path.join(directory, source)) if source is not None else None
+                   for source in manifest["sources"]]
+        images = GeoImageSet.from_columns({name: column(name) for name in FRAME_COLUMNS},
+                                          column("rotations"), column("bounds"),
+                                          [CameraModel.shared(*key) for key in manifest["cameras"]],
+                                          sources)
+        detections = {name: column(f"detection_{name}") for name in DETECTION_COLUMNS}
+        return cls(images, column("footprint_lat"), column("footprint_lon"), detections, path)
+
+
+    def detections_in(self, row):
+        '''
+        Input:  row - frame row
+        Output: lat, lon - arrays of the geolocated detections of the frame
+        '''
+        mask = self.detections["row"] == row
+        return self.detections["lat"][mask], self.detections["lon"][mask]
@@ -7,15 +7,18 @@ Description:    This module converts craft GPS coordinates and heading,
 Version: v1.0.0
 """
 
-from math import sin, cos, pi
+from math import sin, cos, pi, floor, hypot
+import numpy as np
 import geosensor
+from metrics import instrument
 from typing import List
 
 EARTH_RADIUS = 6371000  # Earth's radius in meters
+METERS_PER_DEGREE = EARTH_RADIUS * pi / 180
 
 class Craft:
 
-    def __init__(self, lat: float=0, lon: float=0, alt: float=0, roll: float=0, pitch: float=0, heading: float=0):
+    def __init__(self, lat: float=0, lon: float=0, alt: float=0, roll: float=0, pitch: float=0, heading: float=0, mergeRadius: float=5):
         self.lat = lat
         self.lon = lon
         self.alt = alt
@@ -24,6 +27,7 @@ class Craft:
         self.heading = heading
         self.geosensor = geosensor.GeoSensor()
         self.targetList: List[Target] = []
+        self.targetStore = TargetStore(mergeRadius)
 
 
     def update(self, lat: float, lon: float, alt: float, roll: float, pitch: float, heading: float):
@@ -34,6 +38,30 @@ class Craft:
         self.roll = roll
         self.heading = heading
 
+    def updateFromTelemetry(self, telemetry, timestamp: float, offset: float=0):
+        '''
+        Input:  telemetry - TelemetryBuffer holding the craft's recent poses
+                timestamp - time of the frame or detection in seconds
+                offset - clock offset in seconds between the timestamp source and the telemetry
+        Output: None
+
+        Updates the craft position and attitude to the pose interpolated at the timestamp.
+
+        >>> from telemetry import TelemetryBuffer
+        >>> buffer = TelemetryBuffer()
+        >>> buffer.append(10.0, 40.0, -77.0, 100, 0, 2, 350)
+        >>> buffer.append(11.0, 40.001, -77.002, 120, 4, 0, 10)
+        >>> craft = Craft(0, 0, 0, 0, 0, 0)
+        >>> craft.updateFromTelemetry(buffer, 10.25)
+        >>> [round(float(v), 6) for v in (craft.lat, craft.lon, craft.alt, craft.roll, craft.pitch, craft.heading)]
+        [40.00025, -77.0005, 105.0, 1.0, 1.5, 355.0]
+        >>> craft.updateFromTelemetry(buffer, 10.0, offset=0.75)
+        >>> float(craft.alt), float(craft.heading)
+        (115.0, 5.0)
+        '''
+        pose = telemetry.pose_at(timestamp, offset)
+        self.update(pose["lat"], pose["lon"], pose["alt"], pose["roll"], pose["pitch"], pose["heading"])
+
     def getDisplacement(self, xOffset: int, yOffset: int) -> tuple:
         '''
         Input:  xOffset, yOffset - pixel coordinates
@@ -65,12 +93,14 @@ class Craft:
 
         return latTarget, lonTarget
 
+    @instrument("Craft.getTarget")
     def getTarget(self, x: int, y: int):
         '''
         Input:  x, y - pixel coordinates
         Output: target - Target object
 
         This method returns a Target object with the latitude and longitude of the target.
+        Each call returns a new Target for the detection, pass it to addTarget to de-duplicate it.
         '''
         # get the sensor displacement
         xOffset, yOffset = self.geosensor.geoSensorIO(x, y, self.alt, self.roll, self.pitch)
@@ -83,15 +113,273 @@ class Craft:
 
         return Target(latTarget, lonTarget)
 
+    def addTarget(self, target: "Target") -> "Target":
+        '''
+        Input:  target - Target of a detection, such as the output of getTarget
+        Output: the Target in the craft's target store the detection was merged into, or a new one
+
+        The detection is merged into the nearest stored target within the merge radius, the
+        Target passed in is left unchanged.
+        >>> craft = Craft(40.798214, -77.859909, 100, 0, 0, 0)
+        >>> first, second = craft.getTarget(960, 540), craft.getTarget(965, 540)
+        >>> first is second, first.hits, (first.lat, first.lon) == (second.lat, second.lon)
+        (False, 1, False)
+        >>> track = craft.addTarget(first)
+        >>> craft.addTarget(second) is track, track.hits, first.hits, len(craft.targetStore)
+        (True, 2, 1, 1)
+        '''
+        return self.targetStore.add(target.lat, target.lon)
+
+    def getDisplacementArray(self, xOffset, yOffset) -> tuple:
+        '''
+        Input:  xOffset, yOffset - arrays of sensor offsets in meters
+        Output: targetX, targetY - arrays of displacements from the center of the sensor in meters
+
+        Array counterpart of getDisplacement.
+        '''
+        heading = self.heading * pi / 180
+
+        targetX = yOffset * cos(heading) + xOffset * sin(heading)
+        targetY = xOffset * cos(heading) - yOffset * sin(heading)
+
+        return targetX, targetY
+
+    def getTargetPositionArray(self, dx, dy) -> tuple:
+        '''
+        Input:  dx, dy - arrays of displacements from the center of the sensor in meters
+        Output: lat, lon - arrays of target latitudes and longitudes
+
+        Array counterpart of getTargetPosition.
+        '''
+        latTarget = self.lat + (np.asarray(dy) / EARTH_RADIUS) * (180 / pi)
+        lonTarget = self.lon + (np.asarray(dx) / EARTH_RADIUS) * (180 / pi) / cos(self.lat * pi/180)
+
+        return latTarget, lonTarget
+
+    @instrument("Craft.getTargetArray", points="x")
+    def getTargetArray(self, x, y) -> tuple:
+        '''
+        Input:  x, y - array-likes of pixel coordinates
+        Output: lat, lon - arrays of target latitudes and longitudes, one per pixel
+
+        Array counterpart of getTarget for many detections in the same frame.
+        Targets are returned as columns instead of Target objects.
+
+        >>> craft = Craft(40.798214, -77.859909, 100, 0.1, 0.05, 30)
+        >>> lat, lon = craft.getTargetArray([960, 965, 100, 1800], [540, 540, 900, 60])
+        >>> targets = [craft.getTarget(x, y) for x, y in [(960, 540), (965, 540), (100, 900), (1800, 60)]]
+        >>> np.allclose(lat, [t.lat for t in targets], rtol=0, atol=1e-12)
+        True
+        >>> np.allclose(lon, [t.lon for t in targets], rtol=0, atol=1e-12)
+        True
+        '''
+        xOffset, yOffset = self.geosensor.geoSensorIOArray(x, y, self.alt, self.roll, self.pitch)
+        dx, dy = self.getDisplacementArray(xOffset, yOffset)
+        return self.getTargetPositionArray(dx, dy)
+
 
 class Target:
 
     def __init__(self, lat: float, lon: float):
         self.lat = lat
         self.lon = lon
+        self.hits = 1
 
     def update(self, lat: float, lon: float):
-        self.lat = lat
-        self.lon = lon
+        '''
+        Input:  lat, lon - position of a new detection of this target
+
+        Merges the detection into the running mean position of the target.
+        >>> target = Target(40.0, -77.0)
+        >>> target.update(40.0002, -77.0002)
+        >>> round(target.lat, 6), round(target.lon, 6), target.hits
+        (40.0001, -77.0001, 2)
+        '''
+        self.hits += 1
+        self.lat += (lat - self.lat) / self.hits
+        self.lon += (lon - self.lon) / self.hits
 
 
+class TargetStore:
+
+    def __init__(self, radius: float=5):
+        '''
+        Input:  radius - detections within this distance of a target in meters are merged into it
+
+        Holds de-duplicated targets, hashed into a metric grid with cells the size of the merge
+        radius so that a new detection is only compared against the targets in its 3x3 neighbourhood.
+        '''
+        self.radius = radius
+        self.targets: List[Target] = []
+        self._cells = {}
+        self._lonScale = None # meters per degree longitude, fixed by the first target
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __iter__(self):
+        return iter(self.targets)
+
+    def __getitem__(self, index):
+        return self.targets[index]
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return floor(lat * METERS_PER_DEGREE / self.radius), floor(lon * self._lonScale / self.radius)
+
+    def add(self, lat: float, lon: float) -> Target:
+        '''
+        Input:  lat, lon - position of a detection
+        Output: target - the Target the detection was merged into, or a new Target
+
+        Merges the detection into the nearest target within the merge radius in O(1) expected time.
+        >>> store = TargetStore(radius=5)
+        >>> first = store.add(40.0, -77.0)
+        >>> store.add(40.00001, -77.00001) is first
+        True
+        >>> store.add(40.001, -77.0) is first
+        False
+        >>> len(store), first.hits
+        (2, 2)
+        '''
+        if self._lonScale is None:
+            self._lonScale = METERS_PER_DEGREE * cos(lat * pi / 180)
+
+        row, col = self._cell(lat, lon)
+        nearest = None
+        nearestDistance = self.radius
+        for dRow in (-1, 0, 1):
+            for dCol in (-1, 0, 1):
+                for target in self._cells.get((row + dRow, col + dCol), ()):
+                    distance = hypot((target.lat - lat) * METERS_PER_DEGREE, (target.lon - lon) * self._lonScale)
+                    if distance <= nearestDistance:
+                        nearest = target
+                        nearestDistance = distance
+
+        if nearest is None:
+            target = Target(lat, lon)
+            self.targets.append(target)
+            self._cells.setdefault((row, col), []).append(target)
+            return target
+
+        # the running mean may move the target into a neighbouring cell
+        oldCell = self._cell(nearest.lat, nearest.lon)
+        nearest.update(lat, lon)
+        newCell = self._cell(nearest.lat, nearest.lon)
+        if newCell != oldCell:
+            self._cells[oldCell].remove(nearest)
+            if not self._cells[oldCell]:
+                del self._cells[oldCell]
+            self._cells.setdefault(newCell, []).append(nearest)
+
+        return nearest
+
+    def addArray(self, lat, lon) -> List[Target]:
+        '''
+        Input:  lat, lon - arrays of detection positions, such as the output of Craft.getTargetArray
+        Output: list of the Target each detection was merged into
+        '''
+        return [self.add(float(a), float(b)) for a, b in zip(np.ravel(lat), np.ravel(lon))]
+
+
+class TargetTable:
+
+    def __init__(self, capacity: int=64):
+        '''
+        Input:  capacity - initial number of targets allocated, the columns grow as targets are added
+
+        Holds targets as contiguous lat, lon and hits columns instead of one Target object each.
+        Rows are read and merged through TargetRow views, which behave like Target.
+        >>> table = TargetTable(capacity=2)
+        >>> table.addArray([40.0, 40.001], [-77.0, -77.001]).tolist()
+        [0, 1]
+        >>> table.addArray([40.002], [-77.002], hits=3).tolist(), len(table), table.lat.size >= 3
+        ([2], 3, True)
+        >>> table[-1].lat, table[-1].lon, table[-1].hits
+        (40.002, -77.002, 3)
+        >>> table[0].update(40.0002, -77.0002)
+        >>> round(float(table.lat[0]), 6), table.hits[:3].tolist(), [row.row for row in table]
+        (40.0001, [2, 1, 3], [0, 1, 2])
+        >>> table[3]
+        Traceback (most recent call last):
+        ...
+        IndexError: TargetTable index out of range
+        >>> store = TargetStore()
+        >>> _ = store.add(40.0, -77.0), store.add(40.00001, -77.0)
+        >>> copied = TargetTable.fromTargets(store)
+        >>> len(copied), copied[0].hits
+        (1, 2)
+        '''
+        self.lat = np.zeros(capacity)
+        self.lon = np.zeros(capacity)
+        self.hits = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+
+    @classmethod
+    def fromTargets(cls, targets) -> "TargetTable":
+        '''
+        Input:  targets - iterable of Target objects, such as a TargetStore
+        Output: TargetTable holding their positions and hit counts
+        '''
+        targets = list(targets)
+        table = cls(max(len(targets), 1))
+        table.addArray([t.lat for t in targets], [t.lon for t in targets], [t.hits for t in targets])
+        return table
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, row: int) -> "TargetRow":
+        if not -self._size <= row < self._size:
+            raise IndexError("TargetTable index out of range")
+        return TargetRow(self, row % self._size)
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield TargetRow(self, row)
+
+    def addArray(self, lat, lon, hits=1):
+        '''
+        Input:  lat, lon - arrays of target positions, such as the output of Craft.getTargetArray
+                hits - hit count of each target
+        Output: rows of the added targets
+        '''
+        lat = np.ravel(lat)
+        lon = np.ravel(lon)
+        count = lat.size
+        if self._size + count > self.lat.size:
+            capacity = max(2 * self.lat.size, self._size + count)
+            for name in ("lat", "lon", "hits"):
+                column = getattr(self, name)
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                setattr(self, name, grown)
+
+        rows = np.arange(self._size, self._size + count)
+        self.lat[rows] = lat
+        self.lon[rows] = lon
+        self.hits[rows] = hits
+        self._size += count
+        return rows
+
+
+class TargetRow:
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: TargetTable, row: int):
+        self.table = table
+        self.row = row
+
+    lat = property(lambda self: float(self.table.lat[self.row]))
+    lon = property(lambda self: float(self.table.lon[self.row]))
+    hits = property(lambda self: int(self.table.hits[self.row]))
+
+    def update(self, lat: float, lon: float):
+        '''
+        Input:  lat, lon - position of a new detection of this target
+
+        Merges the detection into the running mean position of the target, as Target.update does.
+        '''
+        table, row = self.table, self.row
+        table.hits[row] += 1
+        table.lat[row] += (lat - table.lat[row]) / table.hits[row]
+        table.lon[row] += (lon - table.lon[row]) / table.hits[row]
@@ -0,0 +1,162 @@
+'''
+telemetry.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module provides a time-indexed ring buffer of aircraft telemetry with fast vectorized pose interpolation.
+Version: v1.0.0
+'''
+
+import numpy as np
+
+COLUMNS = ("time", "lat", "lon", "alt", "roll", "pitch", "heading")
+
+
+def _wrap(angle):
+    '''
+    Wrap angles in degrees to [-180, 180).
+    '''
+    return (angle + 180) % 360 - 180
+
+
+class TelemetryBuffer:
+    def __init__(self, capacity=90000):
+        '''
+        capacity: maximum number of samples kept, the oldest samples are overwritten first
+                  (the default holds 30 minutes of a 50 Hz feed)
+
+        Samples are stored in preallocated numpy columns: time in seconds, lat and lon in degrees,
+        alt in meters, roll and pitch in the caller's units and heading in degrees.
+        '''
+        self.capacity = capacity
+        self.columns = {name: np.zeros(capacity, dtype=np.float64) for name in COLUMNS}
+        self._head = 0 # physical index of the oldest sample
+        self._size = 0
+
+
+    def __len__(self):
+        return self._size
+
+
+    @property
+    def start_time(self):
+        return self.columns["time"][self._head] if self._size else None
+
+
+    @property
+    def end_time(self):
+        return self.columns["time"][(self._head + self._size - 1) % self.capacity] if self._size else None
+
+
+    def covers(self, time):
+        '''
+        Input:  time - timestamp in seconds
+        Output: True if the timestamp lies between the oldest and newest samples
+        '''
+        return self._size > 0 and self.start_time <= time <= self.end_time
+
+
+    def append(self, time, lat, lon, alt, roll, pitch, heading):
+        '''
+        Add one sample. Timestamps must be strictly increasing.
+        '''
+        self.extend([time], [lat], [lon], [alt], [roll], [pitch], [heading])
+
+
+    def extend(self, time, lat, lon, alt, roll, pitch, heading):
+        '''
+        Add many samples at once. Timestamps must be strictly increasing.
+        Input:  arrays of equal length, one entry per sample
+        '''
+        values = [np.atleast_1d(np.asarray(column, dtype=np.float64)) for column in (time, lat, lon, alt, roll, pitch, heading)]
+        count = values[0].size
+        if count == 0:
+            return
+        if np.any(np.diff(values[0]) <= 0) or (self._size and values[0][0] <= self.end_time):
+            raise ValueError("Telemetry timestamps must be strictly increasing")
+
+        # only the newest samples fit in the buffer
+        if count > self.capacity:
+            values = [column[-self.capacity:] for column in values]
+            count = self.capacity
+
+        start = (self._head + self._size) % self.capacity
+        positions = (start + np.arange(count)) % self.capacity
+        for name, column in zip(COLUMNS, values):
+            self.columns[name][positions] = column
+
+        overflow = max(0, self._size + count - self.capacity)
+        self._head = (self._head + overflow) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+
+    def _search(self, time):
+        '''
+        Input:  time - array of timestamps
+        Output: logical index of the first sample later than each timestamp (O(log n) per timestamp)
+        '''
+        times = self.columns["time"]
+        end = self._head + self._size
+        if end <= self.capacity:
+            return np.searchsorted(times[self._head:end], time, side="right")
+
+        # the samples wrap around the end of the buffer, search the older and newer segments
+        older = times[self._head:]
+        newer = times[:end - self.capacity]
+        return np.where(time < newer[0],
+                        np.searchsorted(older, time, side="right"),
+                        older.size + np.searchsorted(newer, time, side="right"))
+
+
+    def interpolate(self, time, offset=0.0):
+        '''
+        Interpolate the pose at arbitrary timestamps.
+        Input:  time - timestamp or array of timestamps in seconds
+                offset - clock offset in seconds added to the timestamps, for sources whose clock
+                         is not synchronized with the autopilot
+        Output: dict of arrays keyed by column name
+
+        Timestamps outside the buffered range are clamped to the oldest or newest sample.
+        Longitude and heading are interpolated along the shorter way around the circle.
+
+        >>> buffer = TelemetryBuffer(capacity=4)
+        >>> for t, heading in enumerate([350, 355, 5, 15, 25]):
+        ...     buffer.append(t, 40.0, -77.0, 20 + t, 0, 0, heading)
+        >>> pose = buffer.interpolate([1.5, 2.5, 10])
+        >>> pose["heading"].round(3).tolist(), pose["alt"].tolist()
+        ([0.0, 10.0, 25.0], [21.5, 22.5, 24.0])
+        '''
+        if self._size == 0:
+            raise ValueError("Telemetry buffer is empty")
+        time = np.asarray(time, dtype=np.float64) + offset
+
+        if self._size == 1:
+            return {name: np.full(time.shape, self.columns[name][self._head]) for name in COLUMNS}
+
+        upper = np.clip(self._search(time), 1, self._size - 1)
+        lower = (self._head + upper - 1) % self.capacity
+        upper = (self._head + upper) % self.capacity
+
+        times = self.columns["time"]
+        fraction = np.clip((time - times[lower]) / (times[upper] - times[lower]), 0.0, 1.0)
+
+        pose = {"time": times[lower] + fraction * (times[upper] - times[lower])}
+        for name in ("lat", "alt", "roll", "pitch"):
+            column = self.columns[name]
+            pose[name] = column[lower] + fraction * (column[upper] - column[lower])
+        for name in ("lon", "heading"):
+            column = self.columns[name]
+            pose[name] = column[lower] + fraction * _wrap(column[upper] - column[lower])
+        pose["lon"] = _wrap(pose["lon"])
+        pose["heading"] = pose["heading"] % 360
+
+        return pose
+
+
+    def pose_at(self, time, offset=0.0):
+        '''
+        Input:  time - timestamp in seconds
+                offset - clock offset in seconds added to the timestamp
+        Output: dict of floats keyed by column name
+        '''
+        return {name: float(value) for name, value in self.interpolate(time, offset).items()}
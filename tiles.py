@@ -0,0 +1,224 @@
+'''
+tiles.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module warps GeoImages onto a local metric tile grid for a live mosaic, with cached remap tables and an LRU tile cache.
+Version: v1.0.0
+'''
+
+import math
+from collections import OrderedDict, defaultdict
+import cv2
+import numpy as np
+from geo_core import ENU_MAX_RANGE, METERS_PER_DEGREE, rotation_matrix, _world_to_camera, _ray_components_to_pixels
+
+
+class TileMosaic:
+    def __init__(self, origin_lat, origin_lon, tile_size=256, resolution=0.05, max_tiles=256, max_maps=1024,
+                 angle_step=0.1, alt_step=0.1, logger=None):
+        '''
+        origin_lat, origin_lon: origin of the tile grid in degrees
+        tile_size: width and height of a tile in pixels
+        resolution: ground size of a tile pixel in meters
+        max_tiles: number of rendered tiles kept in memory
+        max_maps: number of remap tables kept in memory
+        angle_step: attitude bucket in degrees used to share remap tables between frames
+        alt_step: altitude bucket in meters used to share remap tables between frames
+        logger: logger object for logging
+
+        Tiles are square cells of a local East-North plane around the origin. Tile (col, row)
+        covers east in [col, col + 1) and north in [row, row + 1) tile widths from the origin,
+        with row 0 of the tile array at its northern edge.
+
+        A remap table depends on the frame only through its intrinsics, attitude, altitude and
+        position relative to the tile. Frames are snapped to whole tile pixels and bucketed by
+        attitude and altitude, so a steady survey line reuses the same tables. The buckets bound
+        the georeferencing error to about resolution / 2 + alt * radians(angle_step / 2) meters.
+
+        >>> from geo_core import Coordinate
+        >>> from geo_image import GeoImage
+        >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+        >>> images = [GeoImage(np.full((304, 406, 3), 50 * (i + 1), dtype=np.uint8), coordinate.offset_coordinate(10 * i, 90),
+        ...                    0, 0, 0, 406, 304, 6.29, 4.71, 78.3, index=i) for i in range(3)]
+        >>> mosaic = TileMosaic(coordinate.lat, coordinate.lon, tile_size=64, resolution=0.25)
+        >>> for image in images:
+        ...     _ = mosaic.add(image)
+        >>> sorted(mosaic.dirty)
+        [(-1, -1), (-1, 0), (0, -1), (0, 0), (1, -1), (1, 0), (2, -1), (2, 0)]
+        >>> tiles = mosaic.render_dirty()
+        >>> [tiles[(0, 0)][-1, 0].tolist(), tiles[(0, 0)][-1, 50].tolist(), tiles[(2, 0)][-1, 63].tolist()]
+        [[100, 100, 100], [150, 150, 150], [0, 0, 0]]
+        >>> mosaic.map_hits, mosaic.map_misses
+        (0, 16)
+
+        Revisiting a pose reuses its remap tables, and only the dirty tiles are painted again.
+
+        >>> revisit = GeoImage(np.full((304, 406, 3), 250, dtype=np.uint8), images[0].coordinate,
+        ...                    0, 0, 0, 406, 304, 6.29, 4.71, 78.3, index=3)
+        >>> len(mosaic.add(revisit)), len(mosaic.render_dirty()), mosaic.map_hits
+        (4, 4, 4)
+        >>> mosaic.render(0, 0)[-1, 0].tolist(), mosaic.render(0, 0)[-1, 50].tolist()
+        ([250, 250, 250], [150, 150, 150])
+        '''
+        self.origin_lat = origin_lat
+        self.origin_lon = origin_lon
+        self.tile_size = tile_size
+        self.resolution = resolution
+        self.max_tiles = max_tiles
+        self.max_maps = max_maps
+        self.angle_step = math.radians(angle_step)
+        self.alt_step = alt_step
+        self.logger = logger
+        self._lon_scale = METERS_PER_DEGREE * math.cos(math.radians(origin_lat))
+
+        self.images = []
+        self.dirty = set()
+        self._frames = defaultdict(list) # (col, row) -> positions of the images overlapping the tile
+        self._tiles = OrderedDict() # (col, row) -> (tile pixels, number of frames painted)
+        self._maps = OrderedDict()
+        self.map_hits = 0
+        self.map_misses = 0
+
+
+    def _to_plane(self, lat, lon):
+        '''
+        Input:  lat, lon - coordinates in degrees
+        Output: east, north - position on the tile plane in tile pixels
+        '''
+        east = ((np.asarray(lon) - self.origin_lon + 540) % 360 - 180) * self._lon_scale
+        north = (np.asarray(lat) - self.origin_lat) * METERS_PER_DEGREE
+        return east / self.resolution, north / self.resolution
+
+
+    def tile_bounds(self, col, row):
+        '''
+        Input:  col, row - tile indices
+        Output: lat_min, lat_max, lon_min, lon_max - ground bounds of the tile in degrees
+        '''
+        size = self.tile_size * self.resolution
+        return (self.origin_lat + row * size / METERS_PER_DEGREE, self.origin_lat + (row + 1) * size / METERS_PER_DEGREE,
+                self.origin_lon + col * size / self._lon_scale, self.origin_lon + (col + 1) * size / self._lon_scale)
+
+
+    def add(self, image, samples_per_edge=4):
+        '''
+        Register a frame and mark the tiles it overlaps as dirty.
+        Input:  image - GeoImage object
+                samples_per_edge - number of points sampled along each image edge for the footprint
+        Output: list of the (col, row) tiles the frame overlaps
+        '''
+        lat, lon = image.footprint(samples_per_edge)
+        east, north = self._to_plane(lat, lon)
+        if np.isnan(east).any():
+            # the footprint reaches the horizon, keep the part within range of the sensor
+            center_east, center_north = self._to_plane(image.coordinate.lat, image.coordinate.lon)
+            reach = ENU_MAX_RANGE / self.resolution
+            east = np.array([center_east - reach, center_east + reach])
+            north = np.array([center_north - reach, center_north + reach])
+
+        col_min, col_max = math.floor(np.nanmin(east) / self.tile_size), math.floor(np.nanmax(east) / self.tile_size)
+        row_min, row_max = math.floor(np.nanmin(north) / self.tile_size), math.floor(np.nanmax(north) / self.tile_size)
+
+        position = len(self.images)
+        self.images.append(image)
+        tiles = [(col, row) for col in range(col_min, col_max + 1) for row in range(row_min, row_max + 1)]
+        for tile in tiles:
+            self._frames[tile].append(position)
+            self.dirty.add(tile)
+
+        if self.logger:
+            self.logger.info("Image %s overlaps %s tiles", image.index, len(tiles))
+        return tiles
+
+
+    def _remap(self, image, shape, col, row):
+        '''
+        Get the remap table warping a frame onto a tile.
+        Input:  image - GeoImage object
+                shape - shape of the decoded pixels, which may be scaled down from the sensor resolution
+                col, row - tile indices
+        Output: map1, map2 - fixed point maps for cv2.remap
+                mask - boolean array, True where the tile pixel sees the frame
+        '''
+        pose = image.pose
+        step = self.angle_step
+        attitude = (round(pose.roll / step), round(pose.pitch / step), round(pose.heading / step))
+        alt = round(pose.alt / self.alt_step)
+        sensor_east, sensor_north = self._to_plane(pose.lat, pose.lon)
+        offset = (col * self.tile_size - round(float(sensor_east)), (row + 1) * self.tile_size - round(float(sensor_north)))
+
+        key = (image.camera.key, shape[:2], attitude, alt, offset)
+        maps = self._maps.get(key)
+        if maps is not None:
+            self._maps.move_to_end(key)
+            self.map_hits += 1
+            return maps
+        self.map_misses += 1
+
+        # ground position of every tile pixel center relative to the sensor, in meters
+        pixels = np.arange(self.tile_size) + 0.5
+        east = (offset[0] + pixels[None, :]) * self.resolution
+        north = (offset[1] - pixels[:, None]) * self.resolution
+        rotation = rotation_matrix(*(a * step for a in attitude))
+        u, v, w = _world_to_camera(rotation, east, north, alt * self.alt_step)
+        x, y = _ray_components_to_pixels(image.camera, u, v, w)
+
+        with np.errstate(invalid="ignore"):
+            mask = (0 <= x) & (x < image.res_x) & (0 <= y) & (y < image.res_y)
+        # remap samples at pixel centers, the projection puts them at .5
+        map_x = np.where(mask, x * (shape[1] / image.res_x) - 0.5, -1).astype(np.float32)
+        map_y = np.where(mask, y * (shape[0] / image.res_y) - 0.5, -1).astype(np.float32)
+        maps = (*cv2.convertMaps(map_x, map_y, cv2.CV_16SC2), mask)
+
+        self._maps[key] = maps
+        while len(self._maps) > self.max_maps:
+            self._maps.popitem(last=False)
+        return maps
+
+
+    def _paint(self, tile, image, col, row):
+        '''
+        Warp a frame onto a tile, newer frames covering older ones.
+        Input:  tile - tile pixels, modified in place
+                image - GeoImage object
+                col, row - tile indices
+        '''
+        pixels = image.image
+        map1, map2, mask = self._remap(image, pixels.shape, col, row)
+        if not mask.any():
+            return
+        warped = cv2.remap(pixels, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        tile[mask] = warped[mask]
+
+
+    def render(self, col, row):
+        '''
+        Get a tile, painting only the frames that arrived since it was last rendered.
+        Input:  col, row - tile indices
+        Output: tile pixels of shape (tile_size, tile_size, 3), black where no frame has been seen
+        '''
+        key = (col, row)
+        positions = self._frames.get(key, [])
+        cached = self._tiles.pop(key, None)
+        if cached is None:
+            tile, painted = np.zeros((self.tile_size, self.tile_size, 3), dtype=np.uint8), 0
+        else:
+            tile, painted = cached
+
+        for position in positions[painted:]:
+            self._paint(tile, self.images[position], col, row)
+
+        self._tiles[key] = (tile, len(positions))
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        self.dirty.discard(key)
+        return tile
+
+
+    def render_dirty(self):
+        '''
+        Render every dirty tile.
+        Output: dict of (col, row) -> tile pixels
+        '''
+        return {key: self.render(*key) for key in sorted(self.dirty)}
@@ -0,0 +1,159 @@
+'''
+triangulation.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module estimates target positions by least squares intersection of the viewing rays from every frame that saw them, updated incrementally.
+Version: v1.0.0
+'''
+
+import math
+import numpy as np
+from geo_core import ENU_MAX_RANGE, METERS_PER_DEGREE
+
+
+class Triangulator:
+    def __init__(self, origin_lat, origin_lon, angle_sigma=math.radians(0.5), ground_sigma=5):
+        '''
+        origin_lat, origin_lon: origin of the local East-North-Down frame the rays are intersected in
+        angle_sigma: standard deviation of the direction of a ray in radians, from attitude and detection error
+        ground_sigma: standard deviation in meters of the target height about the ground, None to disable the ground prior
+
+        Every ray contributes its projection onto the plane normal to it, weighted by its slant range
+        to the ground, to the 3x3 normal equations A x = b. Only A, b and the weighted squared norm
+        of the sensor positions are kept, so an update costs the same however many sightings came
+        before it. The ground prior keeps the solution defined with a single ray or parallel rays.
+
+        >>> from geo_core import Coordinate
+        >>> from geo_image import GeoImage
+        >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+        >>> target = coordinate.offset_coordinate(5, 45)
+        >>> images = [GeoImage(None, coordinate.offset_coordinate(4 * i, 90), 2 * i, -3, 10 * i,
+        ...                    4056, 3040, 6.29, 4.71, 78.3, index=i) for i in range(4)]
+        >>> track = Triangulator(coordinate.lat, coordinate.lon)
+        >>> for image in images:
+        ...     x, y = image.get_pixels_batch(target.lat, target.lon)
+        ...     track.add(image, x + 0.5, y + 0.5)
+        >>> lat, lon, height, covariance = track.solve()
+        >>> round(target.distance_to(Coordinate(lat, lon, 0, use_int=False)), 2), abs(height) < 0.01
+        (0.0, True)
+        >>> track.count, covariance.shape
+        (4, (3, 3))
+
+        A single sighting is placed on the ground by the prior, with a large height uncertainty.
+
+        >>> single = Triangulator(coordinate.lat, coordinate.lon)
+        >>> x, y = images[0].get_pixels_batch(target.lat, target.lon)
+        >>> single.add(images[0], x + 0.5, y + 0.5)
+        >>> lat, lon, height, covariance = single.solve()
+        >>> round(target.distance_to(Coordinate(lat, lon, 0, use_int=False)), 2), round(math.sqrt(covariance[2, 2]))
+        (0.0, 5)
+        '''
+        self.origin_lat = origin_lat
+        self.origin_lon = origin_lon
+        self.angle_sigma = angle_sigma
+        self.ground_sigma = ground_sigma
+        self._lon_scale = METERS_PER_DEGREE * math.cos(math.radians(origin_lat))
+
+        self.count = 0
+        self.A = np.zeros((3, 3))
+        self.b = np.zeros(3)
+        self.c = 0.0 # weighted squared norm of the sensor positions, for the residual
+        if ground_sigma is not None:
+            # the target lies on the ground, down = 0
+            self.A[2, 2] = 1 / ground_sigma ** 2
+
+
+    def add(self, image, x, y):
+        '''
+        Add the sightings of the target in a frame.
+        Input:  image - GeoImage object
+                x, y - array-likes of pixel coordinates of the target, usually a single sighting
+        '''
+        east, north, down = image.get_rays_batch(x, y)
+        pose = image.pose
+        self.add_rays(east, north, down, pose.lat, pose.lon, pose.alt)
+
+
+    def add_set(self, images, rows, x, y):
+        '''
+        Add sightings from many frames of a GeoImageSet in one vectorized update.
+        Input:  images - GeoImageSet
+                rows - array of frame rows, one per sighting
+                x, y - arrays of pixel coordinates of the target
+
+        Gives the same estimate as adding the frames one by one.
+
+        >>> from geo_core import Coordinate
+        >>> from geo_image import GeoImage
+        >>> from geo_image_set import GeoImageSet
+        >>> coordinate = Coordinate(38.3155, -76.5509, 20, use_int=False)
+        >>> target = coordinate.offset_coordinate(5, 45)
+        >>> images = [GeoImage(None, coordinate.offset_coordinate(4 * i, 90), 2 * i, -3, 10 * i,
+        ...                    4056, 3040, 6.29, 4.71, 78.3, index=i) for i in range(4)]
+        >>> sightings = [image.get_pixels_batch(target.lat, target.lon) for image in images]
+        >>> one_by_one, batched = Triangulator(coordinate.lat, coordinate.lon), Triangulator(coordinate.lat, coordinate.lon)
+        >>> for image, (x, y) in zip(images, sightings):
+        ...     one_by_one.add(image, x + 0.5, y + 0.5)
+        >>> batched.add_set(GeoImageSet.from_images(images), np.arange(4),
+        ...                 [x + 0.5 for x, _ in sightings], [y + 0.5 for _, y in sightings])
+        >>> expected, result = one_by_one.solve(), batched.solve()
+        >>> bool(np.allclose(expected[:3], result[:3], rtol=0, atol=1e-9)), bool(np.allclose(expected[3], result[3]))
+        (True, True)
+        '''
+        rows = np.asarray(rows, dtype=np.int64)
+        east, north, down = images.get_rays(rows, x, y)
+        self.add_rays(east, north, down, images.columns["lat"][rows], images.columns["lon"][rows],
+                      images.columns["alt"][rows])
+
+
+    def add_rays(self, east, north, down, lat, lon, alt):
+        '''
+        Add viewing rays to the normal equations.
+        Input:  east, north, down - array-likes of the components of the unit rays in the world frame
+                lat, lon, alt - position of the sensor for each ray, scalars or arrays
+        '''
+        directions = np.stack(np.broadcast_arrays(east, north, down), axis=-1).reshape(-1, 3)
+        lat, lon, alt = (np.broadcast_to(value, directions.shape[:1]) for value in (lat, lon, alt))
+        sensors = np.stack([((lon - self.origin_lon + 540) % 360 - 180) * self._lon_scale,
+                            (lat - self.origin_lat) * METERS_PER_DEGREE,
+                            -np.asarray(alt, dtype=np.float64)], axis=-1)
+
+        # angular error grows into a position error proportional to the range to the target
+        with np.errstate(divide="ignore"):
+            distance = np.where(directions[:, 2] > 0, alt / directions[:, 2], ENU_MAX_RANGE)
+        weight = 1 / (np.minimum(distance, ENU_MAX_RANGE) * self.angle_sigma) ** 2
+
+        # projection onto the plane normal to each ray, I - d d^T
+        projections = np.eye(3) - directions[:, :, None] * directions[:, None, :]
+        weighted = projections * weight[:, None, None]
+        self.A += weighted.sum(axis=0)
+        self.b += np.einsum("nij,nj->i", weighted, sensors)
+        self.c += float(np.einsum("ni,nij,nj->", sensors, weighted, sensors))
+        self.count += len(directions)
+
+
+    def solve(self):
+        '''
+        Output: lat, lon - estimated target position in degrees
+                height - estimated target height above the ground in meters
+                covariance - 3x3 covariance of the position in meters, East, North, Up
+
+        The covariance is scaled up by the reduced chi-square of the residuals when the sightings
+        disagree by more than angle_sigma.
+        '''
+        if self.count == 0:
+            raise ValueError("Triangulator has no sightings")
+        position = np.linalg.solve(self.A, self.b)
+        covariance = np.linalg.inv(self.A)
+
+        # each ray constrains two directions
+        freedom = 2 * self.count + (self.ground_sigma is not None) - 3
+        if freedom > 0:
+            chi_square = max(float(position @ self.A @ position - 2 * self.b @ position + self.c), 0.0)
+            covariance *= max(chi_square / freedom, 1.0)
+
+        flip = np.diag([1.0, 1.0, -1.0]) # down to up
+        east, north, down = position
+        return (float(self.origin_lat + north / METERS_PER_DEGREE), float(self.origin_lon + east / self._lon_scale),
+                float(-down), flip @ covariance @ flip)
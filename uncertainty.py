@@ -0,0 +1,214 @@
+'''
+uncertainty.py
+PSU UAS
+Authors: Ted Tasman, Vlad Roiban
+Date: 2026-10-17
+Description: This module propagates telemetry noise to geolocated targets by vectorized Monte Carlo sampling of the sensor pose.
+Version: v1.0.0
+'''
+
+import math
+import numpy as np
+from geo_core import rotation_matrix, _enu_to_geo, _pixels_to_ray_components
+
+CHUNK_POINTS = 1 << 20 # samples x detections projected at once, bounds the memory of the temporaries
+
+
+class GeolocationUncertainty:
+    def __init__(self, lat, lon, covariance, valid):
+        '''
+        lat, lon: arrays of the mean target positions in degrees
+        covariance: array of shape (n, 2, 2) of the position covariances in meters, East and North
+        valid: array of the fraction of the samples of each target whose ray reached the ground
+        '''
+        self.lat = lat
+        self.lon = lon
+        self.covariance = covariance
+        self.valid = valid
+
+
+    def __len__(self):
+        return len(self.lat)
+
+
+    def ellipse(self, confidence=0.95):
+        '''
+        Input:  confidence - probability mass inside the ellipse
+        Output: semi_major, semi_minor - arrays of the ellipse semi-axes in meters
+                orientation - array of the direction of the major axis in degrees clockwise from North
+        '''
+        scale = math.sqrt(-2 * math.log(1 - confidence)) # chi-square quantile with two degrees of freedom
+        values, vectors = np.linalg.eigh(self.covariance)
+        values = np.maximum(values, 0)
+        major = vectors[..., :, 1]
+        orientation = np.degrees(np.arctan2(major[..., 0], major[..., 1])) % 180
+        return scale * np.sqrt(values[..., 1]), scale * np.sqrt(values[..., 0]), orientation
+
+
+def _sample_attitude(rng, samples, sigma_alt, sigma_attitude, sigma_heading, sigma_position):
+    '''
+    Output: dictionary of arrays of shape (samples, 1) of pose perturbations, angles in radians
+    '''
+    noise = rng.standard_normal((6, samples, 1))
+    return {
+        "alt": noise[0] * sigma_alt,
+        "roll": noise[1] * math.radians(sigma_attitude),
+        "pitch": noise[2] * math.radians(sigma_attitude),
+        "heading": noise[3] * math.radians(sigma_heading),
+        "east": noise[4] * sigma_position,
+        "north": noise[5] * sigma_position,
+    }
+
+
+def _moments(east, north, totals):
+    '''
+    Accumulate the sums needed for the mean and covariance of the samples, skipping NaN.
+    Input:  east, north - arrays of shape (samples, n) of sampled ground offsets in meters, relative
+                          to a reference close to the mean so that the sums keep their precision
+            totals - array of shape (6, n) of running sums, updated in place
+    '''
+    valid = ~np.isnan(east)
+    if valid.all():
+        totals[0] += len(east)
+    else:
+        east = np.where(valid, east, 0)
+        north = np.where(valid, north, 0)
+        totals[0] += valid.sum(axis=0)
+    totals[1] += east.sum(axis=0)
+    totals[2] += north.sum(axis=0)
+    totals[3] += np.einsum("ij,ij->j", east, east)
+    totals[4] += np.einsum("ij,ij->j", east, north)
+    totals[5] += np.einsum("ij,ij->j", north, north)
+
+
+def _statistics(totals, samples, reference_east, reference_north):
+    '''
+    Input:  totals - array of shape (6, n) of sums from _moments
+            samples - number of samples drawn per target
+            reference_east, reference_north - arrays of the reference the sums were taken relative to
+    Output: mean_east, mean_north - arrays of the mean offsets in meters
+            covariance - array of shape (n, 2, 2)
+            valid - array of the fraction of valid samples
+    '''
+    count, east, north, ee, en, nn = totals
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_east, mean_north = east / count, north / count
+        correction = count / (count - 1)
+        covariance = np.stack([np.stack([ee / count - mean_east ** 2, en / count - mean_east * mean_north], axis=-1),
+                               np.stack([en / count - mean_east * mean_north, nn / count - mean_north ** 2], axis=-1)],
+                              axis=-2) * correction[:, None, None]
+    return mean_east + reference_east, mean_north + reference_north, covariance, count / samples
+
+
+def propagate_geo_image(image, x, y, samples=10000, sigma_alt=0.5, sigma_attitude=1.0, sigma_heading=2.0,
+                        sigma_position=0.0, seed=None):
+    '''
+    Sample pose perturbations and project every detection of a frame under all of them at once.
+    Input:  image - GeoImage object
+            x, y - array-likes of pixel coordinates of the detections
+            samples - number of pose samples
+            sigma_alt - standard deviation of the altitude in meters
+            sigma_attitude - standard deviation of roll and pitch in degrees
+            sigma_heading - standard deviation of the heading in degrees
+            sigma_position - standard deviation of the horizontal sensor position in meters
+            seed - random seed
+    Output: GeolocationUncertainty with one entry per detection
+
+    The rays of the detections are computed once in the camera frame. Every block of samples
+    then rotates all of them with a stack of perturbed rotation matrices and intersects them
+    with the ground, as (samples, detections) arrays.
+
+    >>> from geo_core import Coordinate
+    >>> from geo_image import GeoImage
+    >>> image = GeoImage(None, Coordinate(38.3155, -76.5509, 20, use_int=False),
+    ...                  0, 0, 0, 4056, 3040, 6.29, 4.71, 78.3)
+    >>> result = propagate_geo_image(image, [2028, 4056], [1520, 1520], sigma_heading=0, seed=0)
+    >>> lat, lon, _ = image.get_coordinates_batch([2028, 4056], [1520, 1520])
+    >>> bool(np.allclose(result.lat, lat, rtol=0, atol=1e-6)), result.valid.tolist()
+    (True, [1.0, 1.0])
+    >>> major, minor, orientation = result.ellipse(0.95)
+    >>> [round(float(value), 1) for value in major]
+    [0.9, 1.4]
+
+    At the image center 1 degree of attitude noise at 20 m is about 0.35 m in every direction,
+    while heading noise only swings off-center detections around the sensor.
+
+    >>> round(math.sqrt(result.covariance[0, 0, 0]), 2), round(math.sqrt(result.covariance[0, 1, 1]), 2)
+    (0.35, 0.35)
+    '''
+    rng = np.random.default_rng(seed)
+    camera, pose = image.camera, image.pose
+    rays = np.stack(_pixels_to_ray_components(camera, np.ravel(x), np.ravel(y))) # (3, n)
+    totals = np.zeros((6, rays.shape[1]))
+
+    # nominal ground offsets, the moments are taken relative to them
+    reference_east, reference_north, reference_down = pose.rotation @ rays
+    with np.errstate(invalid="ignore", divide="ignore"):
+        reference_scale = np.where(reference_down > 0, pose.alt / reference_down, 0)
+    reference_east, reference_north = reference_east * reference_scale, reference_north * reference_scale
+
+    block = max(1, CHUNK_POINTS // max(rays.shape[1], 1))
+    for start in range(0, samples, block):
+        count = min(block, samples - start)
+        noise = _sample_attitude(rng, count, sigma_alt, sigma_attitude, sigma_heading, sigma_position)
+        rotation = rotation_matrix(pose.roll + noise["roll"][:, 0], pose.pitch + noise["pitch"][:, 0],
+                                   pose.heading + noise["heading"][:, 0])
+        east, north, down = np.moveaxis(rotation @ rays, 1, 0) # one matrix product per sample
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scale = np.where(down > 0, (pose.alt + noise["alt"]) / down, np.nan)
+        _moments(east * scale + (noise["east"] - reference_east), north * scale + (noise["north"] - reference_north), totals)
+
+    mean_east, mean_north, covariance, valid = _statistics(totals, samples, reference_east, reference_north)
+    lat, lon = _enu_to_geo(pose, np.nan_to_num(mean_east), np.nan_to_num(mean_north))
+    invalid = np.isnan(mean_east)
+    return GeolocationUncertainty(np.where(invalid, np.nan, lat), np.where(invalid, np.nan, lon), covariance, valid)
+
+
+def propagate_craft(craft, x, y, samples=10000, sigma_alt=0.5, sigma_attitude=1.0, sigma_heading=2.0,
+                    sigma_position=0.0, seed=None):
+    '''
+    Monte Carlo counterpart of Craft.getTargetArray, through the GeoSensor model.
+    Input:  craft - targetMapper.Craft object, roll and pitch in radians and heading in degrees
+            x, y - array-likes of pixel coordinates of the detections
+            samples, sigma_alt, sigma_attitude, sigma_heading, sigma_position, seed - as for propagate_geo_image
+    Output: GeolocationUncertainty with one entry per detection
+
+    The perturbations are passed to geoSensorIOArray as (samples, 1) columns that broadcast
+    against the detections.
+
+    >>> from targetMapper import Craft
+    >>> craft = Craft(40.798214, -77.859909, 100, 0.05, 0.02, 30)
+    >>> narrow = propagate_craft(craft, [960, 100], [540, 900], samples=5000, sigma_attitude=0.5, sigma_heading=0.5, seed=0)
+    >>> wide = propagate_craft(craft, [960, 100], [540, 900], samples=5000, sigma_attitude=2, sigma_heading=2, seed=0)
+    >>> len(narrow), narrow.covariance.shape, narrow.valid.tolist()
+    (2, (2, 2, 2), [1.0, 1.0])
+    >>> lat, lon = craft.getTargetArray([960, 100], [540, 900])
+    >>> bool(np.allclose(narrow.lat, lat, rtol=0, atol=1e-5))
+    True
+    >>> bool(np.all(wide.ellipse()[0] > 3 * narrow.ellipse()[0]))
+    True
+    '''
+    rng = np.random.default_rng(seed)
+    x = np.ravel(np.asarray(x, dtype=np.float64))
+    y = np.ravel(np.asarray(y, dtype=np.float64))
+    totals = np.zeros((6, x.size))
+
+    # nominal displacements, the moments are taken relative to them
+    xOffset, yOffset = craft.geosensor.geoSensorIOArray(x, y, craft.alt, craft.roll, craft.pitch)
+    reference_east, reference_north = craft.getDisplacementArray(xOffset, yOffset)
+
+    block = max(1, CHUNK_POINTS // max(x.size, 1))
+    for start in range(0, samples, block):
+        count = min(block, samples - start)
+        noise = _sample_attitude(rng, count, sigma_alt, sigma_attitude, sigma_heading, sigma_position)
+        xOffset, yOffset = craft.geosensor.geoSensorIOArray(x, y, craft.alt + noise["alt"],
+                                                            craft.roll + noise["roll"], craft.pitch + noise["pitch"])
+        # same rotation as Craft.getDisplacementArray, with a heading per sample
+        heading = math.radians(craft.heading) + noise["heading"]
+        east = yOffset * np.cos(heading) + xOffset * np.sin(heading)
+        north = xOffset * np.cos(heading) - yOffset * np.sin(heading)
+        _moments(east + (noise["east"] - reference_east), north + (noise["north"] - reference_north), totals)
+
+    mean_east, mean_north, covariance, valid = _statistics(totals, samples, reference_east, reference_north)
+    lat, lon = craft.getTargetPositionArray(mean_east, mean_north)
+    return GeolocationUncertainty(lat, lon, covariance, valid)